@@ -1,112 +1,152 @@
 # Neighborhood class (for suburban area)
 class Neighborhood:
-    def __init__(self, width, height):
+    # Props scattered along the roads while populating: (list attribute, chance per road tile)
+    ROAD_PROPS = [("street_lights", 0.1)]
+    
+    def __init__(self, width, height, rng=None, layout=None):
         self.width = width
         self.height = height
-        self.road_map = []  # 2D grid to track roads
+        self.rng = rng or random  # Random stream for the layout
+        self.cols = width // TILE_SIZE
+        self.rows = height // TILE_SIZE
+        self.road_map = bytearray()  # Road tiles, one byte per tile, indexed [y * cols + x]
         self.house_positions = []  # List of house coordinates
         self.street_lights = []  # List of street light coordinates
         self.exit_position = (0, 0)  # Position of exit to highway
         
-        # Generate neighborhood layout
-        self.generate_layout()
+        # Generate neighborhood layout, or take a saved one as is
+        if layout is None:
+            self.generate_layout()
+        else:
+            self.road_map, self.house_positions, self.street_lights, self.exit_position = layout
+        
+        # Shared pathfinding field toward the player, used by everything chasing on the roads
+        self.flow_field = RoadFlowField(self)
+        
+    def row_bits(self, y):
+        # A row of the road map as one big integer (byte x of the row -> bits 8x..8x+7),
+        # so whole rows can be shifted and masked at once
+        if not 0 <= y < self.rows:
+            return 0
+        return int.from_bytes(self.road_map[y * self.cols:(y + 1) * self.cols], "little")
         
     def generate_layout(self):
+        cols, rows = self.cols, self.rows
+        
         # Initialize grid with no roads
-        self.road_map = [[False for _ in range(self.height // TILE_SIZE)] for _ in range(self.width // TILE_SIZE)]
+        self.road_map = bytearray(cols * rows)
         
         # Start with main roads (grid pattern)
-        # Create horizontal roads
-        for y in range(3, self.height // TILE_SIZE - 3, 6):
-            for x in range(self.width // TILE_SIZE):
-                self.road_map[x][y] = True
+        # Create horizontal roads (one row slice each)
+        for y in range(3, rows - 3, 6):
+            self.road_map[y * cols:(y + 1) * cols] = b"\x01" * cols
                 
-        # Create vertical roads
-        for x in range(3, self.width // TILE_SIZE - 3, 6):
-            for y in range(self.height // TILE_SIZE):
-                self.road_map[x][y] = True
+        # Create vertical roads (one strided column slice each)
+        for x in range(3, cols - 3, 6):
+            self.road_map[x::cols] = b"\x01" * rows
         
         # Create some curved/diagonal roads to make it more interesting
         for _ in range(3):
-            start_x = random.randint(6, self.width // TILE_SIZE - 12)
-            start_y = random.randint(6, self.height // TILE_SIZE - 12)
-            length = random.randint(5, 10)
+            start_x = self.rng.randint(6, cols - 12)
+            start_y = self.rng.randint(6, rows - 12)
+            length = self.rng.randint(5, 10)
             
             # Direction of road (curved)
             for i in range(length):
                 # Create a simple curved path
-                x = min(self.width // TILE_SIZE - 1, start_x + i)
-                y = min(self.height // TILE_SIZE - 1, start_y + int(i * 0.5))
-                self.road_map[x][y] = True
+                x = min(cols - 1, start_x + i)
+                y = min(rows - 1, start_y + int(i * 0.5))
+                self.road_map[y * cols + x] = 1
         
         # Connect some dead-ends
-        for x in range(1, self.width // TILE_SIZE - 1):
-            for y in range(1, self.height // TILE_SIZE - 1):
-                # Look for "T" junctions and connect them
-                if (self.road_map[x][y] and 
-                    self.road_map[x+1][y] and 
-                    self.road_map[x-1][y] and
-                    not self.road_map[x][y+1] and
-                    not self.road_map[x][y-1]):
-                    if random.random() < 0.3:  # 30% chance to extend
-                        self.road_map[x][y+1] = True
-        
-        # Place houses around the roads
-        self.place_houses()
-        
-        # Place street lights along the roads
-        self.place_street_lights()
+        # Look for "T" junctions (road left, here and right, nothing above or below)
+        # a whole row at a time, on the layout as it stands before any extension
+        rows_bits = [self.row_bits(y) for y in range(rows)]
+        junctions = []
+        for y in range(1, rows - 1):
+            here = rows_bits[y]
+            found = here & (here << 8) & (here >> 8) & ~rows_bits[y - 1] & ~rows_bits[y + 1]
+            if found:
+                found_bytes = found.to_bytes(cols + 1, "little")
+                x = found_bytes.find(1)
+                while x != -1:
+                    junctions.append((x, y))
+                    x = found_bytes.find(1, x + 1)
+        for x, y in junctions:
+            if self.rng.random() < 0.3:  # 30% chance to extend
+                self.road_map[(y + 1) * cols + x] = 1
+        
+        # Place houses around the roads and street lights along them
+        self.populate()
         
         # Create exit to highway (on the right edge)
-        exit_y = None
-        for y in range(self.height // TILE_SIZE):
-            if self.road_map[self.width // TILE_SIZE - 1][y]:
-                exit_y = y
-                break
+        exit_y = self.road_map[cols - 1::cols].find(1)
                 
-        if exit_y is not None:
+        if exit_y != -1:
             self.exit_position = (self.width - TILE_SIZE, exit_y * TILE_SIZE)
         else:
             # Fallback if no road leads to right edge
             self.exit_position = (self.width - TILE_SIZE, self.height // 2)
             # Create a path to the exit
-            for x in range(self.width // TILE_SIZE - 5, self.width // TILE_SIZE):
-                self.road_map[x][self.height // (2 * TILE_SIZE)] = True
+            row = self.height // (2 * TILE_SIZE) * cols
+            self.road_map[row + cols - 5:row + cols] = b"\x01" * 5
     
-    def place_houses(self):
-        # Place houses adjacent to roads but not on them
-        for x in range(1, self.width // TILE_SIZE - 3):
-            for y in range(1, self.height // TILE_SIZE - 3):
-                # Make sure this position is not a road
-                if not self.road_map[x][y] and not self.road_map[x+1][y]:
-                    # Check if there's a road nearby
-                    has_road_nearby = False
-                    for dx in range(-1, 3):
-                        for dy in range(-1, 3):
-                            nx, ny = x + dx, y + dy
-                            if (0 <= nx < self.width // TILE_SIZE and 
-                                0 <= ny < self.height // TILE_SIZE and
-                                self.road_map[nx][ny]):
-                                has_road_nearby = True
-                                break
-                                
-                    if has_road_nearby and random.random() < 0.15:  # Control house density
-                        # Make sure houses aren't too close to each other
-                        too_close = False
-                        for hx, hy in self.house_positions:
-                            if abs(hx - x*TILE_SIZE) < TILE_SIZE*3 and abs(hy - y*TILE_SIZE) < TILE_SIZE*3:
-                                too_close = True
-                                break
-                                
-                        if not too_close:
-                            self.house_positions.append((x*TILE_SIZE, y*TILE_SIZE))
-                            
-    def place_street_lights(self):
-        # Place street lights along roads
-        for x in range(self.width // TILE_SIZE):
-            for y in range(self.height // TILE_SIZE):
-                if self.road_map[x][y] and random.random() < 0.1:  # 10% chance for each road tile
-                    self.street_lights.append((x*TILE_SIZE, y*TILE_SIZE))
+    def road_adjacency_masks(self):
+        # Per row, the tiles where a house may start: not a road itself or to its right,
+        # with a road somewhere from one tile before to two tiles after in both directions
+        cols, rows = self.cols, self.rows
+        full_row = (1 << (8 * cols)) - 1
+        interior = int.from_bytes(b"\x00" + b"\x01" * (cols - 4) + b"\x00" * 3, "little") if cols > 4 else 0
+        
+        dilated = []
+        for y in range(rows):
+            bits = self.row_bits(y)
+            # Road at x-1, x, x+1 or x+2
+            dilated.append(((bits << 8) | bits | (bits >> 8) | (bits >> 16)) & full_row)
+            
+        masks = []
+        for y in range(rows):
+            if not 1 <= y < rows - 3:
+                masks.append(0)
+                continue
+            near_road = dilated[y - 1] | dilated[y] | dilated[y + 1] | dilated[y + 2]
+            bits = self.row_bits(y)
+            masks.append(near_road & ~bits & ~(bits >> 8) & interior)
+        return masks
+        
+    def populate(self):
+        # Place houses, street lights and any other road props in a single pass
+        cols, rows = self.cols, self.rows
+        house_masks = self.road_adjacency_masks()
+        
+        # Occupancy grid: cells where a house can't go because another one is too close
+        occupied = bytearray(cols * rows)
+        
+        for y in range(rows):
+            row = y * cols
+            
+            # Props along the roads (e.g. 10% chance of a street light per tile)
+            x = self.road_map.find(1, row, row + cols)
+            while x != -1:
+                for prop_list, chance in self.ROAD_PROPS:
+                    if self.rng.random() < chance:
+                        getattr(self, prop_list).append(((x - row)*TILE_SIZE, y*TILE_SIZE))
+                x = self.road_map.find(1, x + 1, row + cols)
+                
+            # Place houses adjacent to roads but not on them
+            if not house_masks[y]:
+                continue
+            candidates = house_masks[y].to_bytes(cols, "little")
+            x = candidates.find(1)
+            while x != -1:
+                if not occupied[row + x] and self.rng.random() < 0.15:  # Control house density
+                    self.house_positions.append((x*TILE_SIZE, y*TILE_SIZE))
+                    
+                    # Make sure houses aren't too close to each other (within 3 tiles)
+                    left, right = max(0, x - 2), min(cols, x + 3)
+                    for oy in range(max(0, y - 2), min(rows, y + 3)):
+                        occupied[oy * cols + left:oy * cols + right] = b"\x01" * (right - left)
+                x = candidates.find(1, x + 1)
                     
     def is_road(self, x, y):
         # Convert pixel coordinates to grid coordinates
@@ -114,9 +154,8 @@ class Neighborhood:
         grid_y = int(y // TILE_SIZE)
     
         # Check bounds
-        if (0 <= grid_x < self.width // TILE_SIZE and 
-            0 <= grid_y < self.height // TILE_SIZE):
-            return self.road_map[grid_x][grid_y]
+        if 0 <= grid_x < self.cols and 0 <= grid_y < self.rows:
+            return self.road_map[grid_y * self.cols + grid_x] == 1
         return False
         
     def draw(self, screen, camera_x, camera_y):
@@ -131,18 +170,20 @@ class Neighborhood:
                 offset_y = (camera_y // 3) % ground_height
                 screen.blit(GROUND_IMG, (x - offset_x, y - offset_y))
         
-        # Draw roads
-        for x in range(self.width // TILE_SIZE):
-            for y in range(self.height // TILE_SIZE):
-                if self.road_map[x][y]:
-                    # Calculate screen position
-                    screen_x = x * TILE_SIZE - camera_x
-                    screen_y = y * TILE_SIZE - camera_y
-                    
-                    # Only draw if visible on screen
-                    if (-TILE_SIZE < screen_x < SCREEN_WIDTH and 
-                        -TILE_SIZE < screen_y < SCREEN_HEIGHT):
-                        screen.blit(ROAD_IMG, (screen_x, screen_y))
+        # Draw roads (only the rows and columns of tiles that are visible on screen)
+        first_x = max(0, int(camera_x // TILE_SIZE))
+        last_x = min(self.cols, int((camera_x + SCREEN_WIDTH) // TILE_SIZE) + 1)
+        first_y = max(0, int(camera_y // TILE_SIZE))
+        last_y = min(self.rows, int((camera_y + SCREEN_HEIGHT) // TILE_SIZE) + 1)
+        for y in range(first_y, last_y):
+            # Copy out the visible stretch of the row (the road map may be a view into a level file)
+            row = y * self.cols
+            tiles = bytes(self.road_map[row + first_x:row + last_x])
+            x = tiles.find(1)
+            while x != -1:
+                # Calculate screen position
+                screen.blit(ROAD_IMG, ((first_x + x) * TILE_SIZE - camera_x, y * TILE_SIZE - camera_y))
+                x = tiles.find(1, x + 1)
         
         # Draw highway exit
         exit_x, exit_y = self.exit_position
@@ -157,40 +198,45 @@ class Neighborhood:
             screen.blit(exit_sign, (screen_exit_x + 10, screen_exit_y + 5))
         
         # Draw houses
-        for house_x, house_y in self.house_positions:
-            screen_house_x = house_x - camera_x
-            screen_house_y = house_y - camera_y
-            
-            if (-TILE_SIZE*2 < screen_house_x < SCREEN_WIDTH and 
-                -TILE_SIZE*2 < screen_house_y < SCREEN_HEIGHT):
-                # Use a random house design from our house images
-                house_idx = (house_x // TILE_SIZE + house_y // TILE_SIZE) % len(HOUSE_IMGS)
-                screen.blit(HOUSE_IMGS[house_idx], (screen_house_x, screen_house_y))
+        for house_x, house_y in self.visible_houses(camera_x, camera_y):
+            # Use a random house design from our house images
+            house_idx = (house_x // TILE_SIZE + house_y // TILE_SIZE) % len(HOUSE_IMGS)
+            screen.blit(HOUSE_IMGS[house_idx], (house_x - camera_x, house_y - camera_y))
         
         # Draw street lights
-        for light_x, light_y in self.street_lights:
-            screen_light_x = light_x - camera_x
-            screen_light_y = light_y - camera_y
+        for light_x, light_y in self.visible_lights(camera_x, camera_y):
+            screen.blit(STREET_LIGHT_IMG, (light_x - camera_x, light_y - camera_y))
             
-            if (-TILE_SIZE < screen_light_x < SCREEN_WIDTH and 
-                -TILE_SIZE < screen_light_y < SCREEN_HEIGHT):
-                screen.blit(STREET_LIGHT_IMG, (screen_light_x, screen_light_y))
+    def visible_houses(self, camera_x, camera_y):
+        return [(house_x, house_y) for house_x, house_y in self.house_positions 
+                if -TILE_SIZE*2 < house_x - camera_x < SCREEN_WIDTH and 
+                   -TILE_SIZE*2 < house_y - camera_y < SCREEN_HEIGHT]
+                   
+    def visible_lights(self, camera_x, camera_y):
+        return [(light_x, light_y) for light_x, light_y in self.street_lights 
+                if -TILE_SIZE < light_x - camera_x < SCREEN_WIDTH and 
+                   -TILE_SIZE < light_y - camera_y < SCREEN_HEIGHT]
 
 # Highway class (for escape sequence)
 class Highway:
-    def __init__(self, length):
+    def __init__(self, length, rng=None, render_rng=None, obstacles=None):
         self.length = length
         self.width = TILE_SIZE * 5  # 5 lanes
         self.obstacles = []  # List of [position, lane_y]
+        self.rng = rng or random  # Random stream for obstacles and swerves
+        self.render_rng = render_rng or random  # Random stream for decoration only
         
-        # Generate some obstacles
-        self.generate_obstacles()
+        # Generate some obstacles (unless restoring saved ones)
+        if obstacles is None:
+            self.generate_obstacles()
+        else:
+            self.obstacles = obstacles
         
     def generate_obstacles(self):
         # Add cars and other obstacles along the highway
         for i in range(0, self.length, TILE_SIZE*3):
-            if random.random() < 0.3:  # 30% chance for an obstacle
-                lane = random.randint(0, 4)  # 5 lanes
+            if self.rng.random() < 0.3:  # 30% chance for an obstacle
+                lane = self.rng.randint(0, 4)  # 5 lanes
                 self.obstacles.append([i, lane * TILE_SIZE])  # Use list instead of tuple
                 
     def handle_collisions(self, vehicle_x, vehicle_y, vehicle_width, vehicle_height, position):
@@ -209,7 +255,7 @@ class Highway:
                     if current_lane < 4:
                         possible_lanes.append(current_lane + 1)  # Down
                     if possible_lanes:
-                        new_lane = random.choice(possible_lanes)
+                        new_lane = self.rng.choice(possible_lanes)
                         obs[1] = new_lane * TILE_SIZE  # Update lane position
                 
     def draw(self, screen, position):
@@ -267,7 +313,7 @@ class Highway:
                       (x_pos + TILE_SIZE*2, SCREEN_HEIGHT * 2 // 3))
             
             # Occasional road sign
-            if random.random() < 0.3:
+            if self.render_rng.random() < 0.3:
                 pygame.draw.rect(screen, (100, 100, 100), (x_pos + TILE_SIZE, SCREEN_HEIGHT // 4, 5, TILE_SIZE))
                 pygame.draw.rect(screen, (255, 255, 255), (x_pos + TILE_SIZE - 10, SCREEN_HEIGHT // 4 - 20, 25, 20))
                 
@@ -292,6 +338,83 @@ class Highway:
                 
         return False
 
+# Road flow field class (BFS distance field over the road tiles toward a target)
+class RoadFlowField:
+    # Grid steps a pursuer can take, indexed by the value stored in next_step
+    STEPS = [(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)]
+    
+    def __init__(self, neighborhood):
+        self.neighborhood = neighborhood
+        self.cols = neighborhood.cols
+        self.rows = neighborhood.rows
+        # Allocated on the first update, so neighborhoods nobody chases through cost nothing
+        self.distance = None  # Road steps to the target, -1 if unreachable
+        self.next_step = None  # Index into STEPS toward the target
+        self.reached = array("i")  # Cells the last search reached (the only ones to reset)
+        self.target_cell = None
+        
+    def update(self, target_x, target_y):
+        grid_x = int(target_x // TILE_SIZE)
+        grid_y = int(target_y // TILE_SIZE)
+        if not self.neighborhood.is_road(target_x, target_y):
+            return  # Keep following the last road cell the target was on
+        cell = grid_y * self.cols + grid_x
+        if cell == self.target_cell:
+            return  # Only recompute when the target changes cell
+        self.target_cell = cell
+        
+        if self.distance is None:
+            self.distance = array("i", [-1]) * (self.cols * self.rows)
+            self.next_step = bytearray(self.cols * self.rows)
+            
+        # Breadth-first search outward from the target over the road tiles,
+        # pointing every reached tile back at the neighbor it was reached from
+        cols, rows, road_map = self.cols, self.rows, self.neighborhood.road_map
+        distance, next_step = self.distance, self.next_step
+        for reached in self.reached:
+            distance[reached] = -1
+        distance[cell] = 0
+        next_step[cell] = 0
+        # The queue is never popped, just read through, so afterwards it holds exactly
+        # the cells the next search has to reset
+        queue = array("i", [cell])
+        head = 0
+        while head < len(queue):
+            current = queue[head]
+            head += 1
+            x, y = current % cols, current // cols
+            next_distance = distance[current] + 1
+            # Neighbor to the left steps right (1) to get here, and so on
+            if x > 0 and road_map[current - 1] and distance[current - 1] < 0:
+                distance[current - 1] = next_distance
+                next_step[current - 1] = 1
+                queue.append(current - 1)
+            if x < cols - 1 and road_map[current + 1] and distance[current + 1] < 0:
+                distance[current + 1] = next_distance
+                next_step[current + 1] = 2
+                queue.append(current + 1)
+            if y > 0 and road_map[current - cols] and distance[current - cols] < 0:
+                distance[current - cols] = next_distance
+                next_step[current - cols] = 3
+                queue.append(current - cols)
+            if y < rows - 1 and road_map[current + cols] and distance[current + cols] < 0:
+                distance[current + cols] = next_distance
+                next_step[current + cols] = 4
+                queue.append(current + cols)
+        self.reached = queue
+                
+    def step_at(self, x, y):
+        # Grid step (dx, dy) toward the target from pixel (x, y), or None if there's
+        # no road path from here (or we're already in the target's cell)
+        grid_x = int(x // TILE_SIZE)
+        grid_y = int(y // TILE_SIZE)
+        if not (0 <= grid_x < self.cols and 0 <= grid_y < self.rows):
+            return None
+        cell = grid_y * self.cols + grid_x
+        if self.distance is None or self.distance[cell] <= 0:
+            return None
+        return self.STEPS[self.next_step[cell]]
+
 # Boss Monster class (for chase sequence)
 class BossMonster:
     def __init__(self, x, y):
@@ -302,54 +425,91 @@ class BossMonster:
         self.speed = MONSTER_SPEED * 1.2  # Slightly faster than regular monsters
         self.image = BOSS_MONSTER_IMG
         self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.prev_x = x  # Position at the start of the current tick (for interpolation)
+        self.prev_y = y
+        
+    def snapshot(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
         
     def update(self, target_x, target_y, neighborhood):
-        # Calculate direction to target
-        dx = target_x - self.x
-        dy = target_y - self.y
-        
-        # Calculate distance
-        distance = math.sqrt(dx**2 + dy**2)
-        
-        if distance > 0:
-            # Normalize direction
-            dx /= distance
-            dy /= distance
-            
-            # Move towards target
-            new_x = self.x + dx * self.speed
-            new_y = self.y + dy * self.speed
-            
-            # Try to stay on roads when possible
-            if neighborhood.is_road(new_x + self.width//2, new_y + self.height//2):
-                self.x = new_x
-                self.y = new_y
+        center_x = self.x + self.width//2
+        center_y = self.y + self.height//2
+        
+        # Follow the road flow field toward the target when it has a path for us
+        flow_field = neighborhood.flow_field
+        flow_field.update(target_x, target_y)
+        step = flow_field.step_at(center_x, center_y)
+        
+        if step:
+            # Head for the center of the next road tile along the path
+            grid_x = int(center_x // TILE_SIZE) + step[0]
+            grid_y = int(center_y // TILE_SIZE) + step[1]
+            dx = grid_x * TILE_SIZE + TILE_SIZE//2 - center_x
+            dy = grid_y * TILE_SIZE + TILE_SIZE//2 - center_y
+            distance = math.sqrt(dx**2 + dy**2)
+            if distance <= self.speed:
+                self.x += dx
+                self.y += dy
             else:
-                # Try each direction separately
-                if neighborhood.is_road(new_x + self.width//2, self.y + self.height//2):
-                    self.x = new_x
-                elif neighborhood.is_road(self.x + self.width//2, new_y + self.height//2):
-                    self.y = new_y
-                else:
-                    # If no road available, just move slower
-                    self.x += dx * self.speed * 0.5
-                    self.y += dy * self.speed * 0.5
+                self.x += dx / distance * self.speed
+                self.y += dy / distance * self.speed
+        else:
+            # Off the road network or already in the target's tile: go straight for it
+            dx = target_x - center_x
+            dy = target_y - center_y
+            distance = math.sqrt(dx**2 + dy**2)
+            
+            if distance > 0:
+                # Normalize direction
+                dx /= distance
+                dy /= distance
+                
+                # Crawl at half speed when off-road
+                speed = self.speed if neighborhood.is_road(center_x, center_y) else self.speed * 0.5
+                self.x += dx * speed
+                self.y += dy * speed
         
         # Update rectangle
         self.rect.x = self.x
         self.rect.y = self.y
         
-    def draw(self, screen, camera_x, camera_y):
-        screen.blit(self.image, (self.x - camera_x, self.y - camera_y))
+    def draw(self, screen, camera_x, camera_y, alpha=1.0):
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        screen.blit(self.image, (x - camera_x, y - camera_y))
         
     def collides_with(self, other):
         return self.rect.colliderect(other.rect)
 import pygame
+import argparse
 import random
 import sys
 import os
 import math
+import operator
+import struct
+import time
+import tracemalloc
+import json
+import multiprocessing
+import queue
+import subprocess
+import threading
+import gzip
+import mmap
+import zlib
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 from enum import Enum
+from itertools import chain, compress, product
+
+try:
+    import numpy as np  # Optional: array views of environment observations
+except ImportError:
+    np = None
 
 # Initialize pygame
 pygame.init()
@@ -363,8 +523,67 @@ PLAYER_SPEED = 3
 MONSTER_SPEED = 1.5
 FRIEND_SPEED = 2.5
 FONT_SIZE = 24
+FPS = 60  # Game ticks per second (the simulation clock advances 1000 / FPS ms per tick)
+TICK_TIME = 1000 / FPS  # Wall milliseconds covered by one simulation tick
+MAX_FRAME_TIME = 250  # Longest frame the loop catches up on (about 15 ticks)
+MAX_RENDER_FPS = 240  # Frame rate cap for drawing (the simulation rate stays at FPS)
 SCOOBY_SNACK_BOOST_DURATION = 5000  # 5 seconds in milliseconds
 MONSTER_STUN_DURATION = 6000  # 6 seconds
+MONSTER_CHASE_RANGE = 200  # Distance at which "chase" monsters go after Scooby
+NUM_MONSTERS = 5  # Monsters in the forest (the last two chase, the rest patrol)
+TRAP_RANGE = TILE_SIZE * 3  # How close a monster must be for a trap to catch it
+COURAGE_DRAIN_NEAR = 1  # Courage lost per tick with a monster within 100 pixels
+COURAGE_DRAIN_FAR = 0.5  # Courage lost per tick with a monster within 200 pixels
+COURAGE_RECOVERY = 0.2  # Courage regained per tick with no monster around
+AI_NEAR_RANGE = SCREEN_WIDTH  # Monsters this close to Scooby think every tick
+AI_SCREEN_RANGE = math.hypot(SCREEN_WIDTH, SCREEN_HEIGHT) / 2 + TILE_SIZE * 2  # ...or this close to the screen's center
+AI_FAR_RANGE = SCREEN_WIDTH * 2  # Out to here they think every AI_FAR_INTERVAL ticks
+AI_FAR_INTERVAL = 4
+AI_COARSE_INTERVAL = 16  # Further still: one coarse jump along their patrol every this many ticks
+TRAIL_SPACING = 3  # Pixels between breadcrumbs on Scooby's trail
+TRAIL_CAPACITY = 256  # Breadcrumbs kept (enough for every friend to follow)
+CHUNK_SIZE = TILE_SIZE * 12  # Side of a streaming forest chunk (4x4 tree grid cells)
+STREAM_MAX_CHUNKS = 64  # Streaming forest chunks kept in memory
+REWIND_SECONDS = 30  # Play time kept in the rewind buffer
+DIRECTIONS = ["up", "down", "left", "right"]  # Patrol directions (indexed in rewind snapshots)
+
+# Held-key input, packed into one byte per tick (arrow keys or WASD, Z to rewind)
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_REWIND = 16
+INPUT_KEYS = ((INPUT_LEFT, (pygame.K_LEFT, pygame.K_a)), 
+              (INPUT_RIGHT, (pygame.K_RIGHT, pygame.K_d)), 
+              (INPUT_UP, (pygame.K_UP, pygame.K_w)), 
+              (INPUT_DOWN, (pygame.K_DOWN, pygame.K_s)), 
+              (INPUT_REWIND, (pygame.K_z,)))
+
+# Recorded session file layout (gzip-compressed)
+SESSION_MAGIC = b"SDRP"
+SESSION_VERSION = 6
+SESSION_HEADER = struct.Struct("<4sBBq")  # magic, version, flags, seed
+SESSION_TICK = struct.Struct("<BHI")  # input bits, event count, state hash
+SESSION_EVENT = struct.Struct("<BIB")  # kind, key, unicode length
+SESSION_INFINITE = 1  # Header flag: session played in the streaming forest
+SESSION_LEVEL = 2  # Header flag: session played on a level file, whose path follows the header
+SESSION_LEVEL_PATH = struct.Struct("<H")  # Length of that path
+EVENT_QUIT = 0
+EVENT_KEYDOWN = 1
+
+# Saved games: a JSON header (scalars, entities, timers) followed by packed arrays
+SAVE_MAGIC = b"SDSV"
+SAVE_VERSION = 2
+SAVE_HEADER = struct.Struct("<4sHI")  # magic, version, JSON header length
+SAVE_ALIGN = 8  # Arrays start on 8-byte boundaries so they can be viewed in place
+LEVEL_MAGIC = b"SDLV"  # Level files use the same layout (tile layers and spawn tables)
+LEVEL_VERSION = 1
+QUICKSAVE_FILE = "quicksave.sdsv"  # Written by F5, read back by F9
+COLLECTIBLE_TYPES = ("snack", "trap")  # Collectible type codes in saved games
+TIMER_HANDLES = ("boost_timer", "stun_timer", "direction_timer")  # Entity attributes holding a pending timer
+
+# Byte translation table that turns a blocked-cell mask into a free-cell mask
+FREE_CELL_TABLE = bytes([1] + [0] * 255)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -800,6 +1019,113 @@ except:
     SNACK_SOUND = pygame.mixer.Sound(pygame.sndarray.array([0]))
     TRAP_SOUND = pygame.mixer.Sound(pygame.sndarray.array([0]))
 
+# Game RNG class (one independent, reproducible random stream per subsystem)
+class GameRNG:
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.streams = {}  # subsystem name -> random.Random
+        
+    def stream(self, name):
+        # Each stream is seeded from (seed, name) alone, so one subsystem drawing more
+        # or fewer numbers never shifts another
+        if name not in self.streams:
+            self.streams[name] = random.Random(f"{self.seed}:{name}")
+        return self.streams[name]
+
+# Timer class (one scheduled callback; cancelled timers are skipped when their slot fires)
+class Timer:
+    def __init__(self, due, callback, order=0):
+        self.due = due  # Tick the callback runs on
+        self.callback = callback
+        self.order = order  # Scheduling order (timers due on the same tick fire in this order)
+        self.cancelled = False
+
+# Timer wheel class (hierarchical: level k buckets timers by digit k of their due tick in
+# base `slots`, so scheduling is O(1) and each tick only looks at one slot)
+class TimerWheel:
+    def __init__(self, slots=64, levels=4):
+        self.slots = slots
+        self.tick = 0  # Simulation ticks advanced so far
+        self.levels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []  # Timers beyond the top level's span
+        self.scheduled = 0  # Timers scheduled so far
+        
+    def ticks_for(self, delay_ms):
+        return max(1, round(delay_ms * FPS / 1000))
+        
+    def schedule(self, delay_ms, callback):
+        return self.schedule_at(self.tick + self.ticks_for(delay_ms), callback)
+        
+    def schedule_at(self, due, callback):
+        timer = Timer(due, callback, self.scheduled)
+        self.scheduled += 1
+        self.place(timer)
+        return timer
+        
+    def reset(self, tick):
+        # Drop every timer and carry on from tick (used when rewinding)
+        self.tick = tick
+        self.levels = [[[] for _ in range(self.slots)] for _ in self.levels]
+        self.overflow = []
+        
+    def pending(self):
+        # Every live timer in firing order (for saving the game)
+        timers = [timer for level in self.levels for slot in level for timer in slot]
+        timers += self.overflow
+        return sorted((timer for timer in timers if not timer.cancelled), 
+                      key=lambda timer: (timer.due, timer.order))
+        
+    def cancel(self, timer):
+        if timer:
+            timer.cancelled = True
+            
+    def place(self, timer):
+        # Lowest level whose span still contains both now and the due tick
+        span = 1
+        for level in self.levels:
+            if timer.due // (span * self.slots) == self.tick // (span * self.slots):
+                level[timer.due // span % self.slots].append(timer)
+                return
+            span *= self.slots
+        self.overflow.append(timer)
+        
+    def advance(self):
+        self.tick += 1
+        
+        # Entering a new block of a level: move its timers down to finer levels,
+        # coarsest first
+        span = self.slots ** len(self.levels)
+        if self.tick % span == 0:
+            timers, self.overflow = self.overflow, []
+            for timer in timers:
+                self.place(timer)
+        for depth in range(len(self.levels) - 1, 0, -1):
+            span //= self.slots
+            if self.tick % span == 0:
+                slot = self.tick // span % self.slots
+                timers = self.levels[depth][slot]
+                self.levels[depth][slot] = []
+                for timer in timers:
+                    self.place(timer)
+                    
+        # Fire everything due now (callbacks may schedule new timers)
+        slot = self.tick % self.slots
+        timers = self.levels[0][slot]
+        self.levels[0][slot] = []
+        for timer in timers:
+            if not timer.cancelled:
+                timer.callback()
+
+def pack_input(pressed):
+    # Fold pygame's key state into the movement bits the update code reads
+    input_bits = 0
+    for bit, keys in INPUT_KEYS:
+        if any(pressed[key] for key in keys):
+            input_bits |= bit
+    return input_bits
+
 # Game states
 class GameState(Enum):
     MENU = 0
@@ -811,42 +1137,95 @@ class GameState(Enum):
 
 # Character class
 class Character:
-    def __init__(self, x, y, image, speed):
+    # Slots instead of a per-instance dict; the rect is derived from x/y when asked for
+    __slots__ = ("x", "y", "image", "speed", "width", "height", "direction", "steps", "prev_x", "prev_y")
+    
+    def __init__(self, x, y, image, speed, rng=None):
         self.x = x
         self.y = y
         self.image = image
         self.speed = speed
         self.width = image.get_width()
         self.height = image.get_height()
-        self.rect = pygame.Rect(x, y, self.width, self.height)
-        self.direction = random.choice(["up", "down", "left", "right"])
+        self.direction = (rng or random).choice(DIRECTIONS)
         self.steps = 0
+        self.prev_x = x  # Position at the start of the current tick (for interpolation)
+        self.prev_y = y
         
-    def update(self):
-        self.rect.x = self.x
-        self.rect.y = self.y
+    @property
+    def rect(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
         
-    def draw(self, screen, camera_x, camera_y):
-        screen.blit(self.image, (self.x - camera_x, self.y - camera_y))
+    def snapshot(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
+        
+    def render_position(self, alpha):
+        # Blend between the last two ticks so drawing runs smoothly at any frame rate
+        return (self.prev_x + (self.x - self.prev_x) * alpha, 
+                self.prev_y + (self.y - self.prev_y) * alpha)
+        
+    def draw(self, screen, camera_x, camera_y, alpha=1.0):
+        x, y = self.render_position(alpha)
+        screen.blit(self.image, (x - camera_x, y - camera_y))
         
     def collides_with(self, other):
         return self.rect.colliderect(other.rect)
 
+# Breadcrumb trail class (ring buffer of evenly spaced positions the player walked through)
+class BreadcrumbTrail:
+    def __init__(self, capacity=TRAIL_CAPACITY, spacing=TRAIL_SPACING):
+        self.capacity = capacity
+        self.spacing = spacing
+        self.xs = array("d", [0.0]) * capacity
+        self.ys = array("d", [0.0]) * capacity
+        self.head = 0  # Slot of the newest crumb
+        
+    def reset(self, x, y, direction_x=-1, direction_y=0):
+        # Fill the whole buffer with a straight line trailing away from (x, y)
+        for i in range(self.capacity):
+            self.xs[i] = x + direction_x * self.spacing * (self.capacity - 1 - i)
+            self.ys[i] = y + direction_y * self.spacing * (self.capacity - 1 - i)
+        self.head = self.capacity - 1
+        
+    def push(self, x, y):
+        self.head = (self.head + 1) % self.capacity
+        self.xs[self.head] = x
+        self.ys[self.head] = y
+        
+    def record(self, x, y):
+        # Drop crumbs every `spacing` pixels along the path from the newest crumb to (x, y),
+        # so trail offsets stay the same distance apart whatever the movement speed
+        last_x, last_y = self.xs[self.head], self.ys[self.head]
+        dx, dy = x - last_x, y - last_y
+        distance_sq = dx * dx + dy * dy
+        if distance_sq < self.spacing * self.spacing:
+            return
+        distance = math.sqrt(distance_sq)
+        steps = int(distance // self.spacing)
+        for i in range(1, steps + 1):
+            ratio = i * self.spacing / distance
+            self.push(last_x + dx * ratio, last_y + dy * ratio)
+            
+    def at(self, offset):
+        # Position `offset` crumbs behind the newest one
+        slot = (self.head - min(offset, self.capacity - 1)) % self.capacity
+        return self.xs[slot], self.ys[slot]
+
 # Player class (Scooby Doo)
 class Player(Character):
+    __slots__ = ("found_friends", "has_speed_boost", "boost_timer", "courage", "trail")
+    
     def __init__(self, x, y):
         super().__init__(x, y, SCOOBY_IMG, PLAYER_SPEED)
         self.found_friends = []
         self.has_speed_boost = False
-        self.boost_end_time = 0
+        self.boost_timer = None  # Pending boost expiry
         self.courage = 100  # Courage meter (decreases when near monsters)
+        self.trail = BreadcrumbTrail()  # Path that found friends walk along
+        self.trail.reset(x, y)
         
     def move(self, dx, dy, forest):
-        # Check if speed boost is active
-        if self.has_speed_boost and pygame.time.get_ticks() > self.boost_end_time:
-            self.has_speed_boost = False
-            self.speed = PLAYER_SPEED
-        
         # Apply movement
         speed = self.speed * 2 if self.has_speed_boost else self.speed
         new_x = self.x + dx * speed
@@ -857,141 +1236,130 @@ class Player(Character):
             self.x = new_x
         if self.can_move_to(self.x, new_y, forest):
             self.y = new_y
-            
-        # Update rectangle position
-        self.update()
         
     def can_move_to(self, x, y, forest):
-        # Check forest boundaries
-        if x < 0 or y < 0 or x > forest.width - self.width or y > forest.height - self.height:
-            return False
+        # Check forest boundaries and trees
+        return not forest.blocks(pygame.Rect(x, y, self.width, self.height))
         
-        # Check collision with trees
-        test_rect = pygame.Rect(x, y, self.width, self.height)
-        for tree in forest.trees:
-            if test_rect.colliderect(tree):
-                return False
-                
-        return True
-        
-    def activate_speed_boost(self):
+    def activate_speed_boost(self, timers):
+        # A new snack restarts the boost rather than stacking
+        timers.cancel(self.boost_timer)
         self.has_speed_boost = True
-        self.boost_end_time = pygame.time.get_ticks() + SCOOBY_SNACK_BOOST_DURATION
-        
-    def update_courage(self, monsters):
-        # Decrease courage when near monsters
-        closest_distance = float('inf')
-        for monster in monsters:
-            if not monster.is_stunned:  # Only count active monsters
-                dx = monster.x - self.x
-                dy = monster.y - self.y
-                distance = math.sqrt(dx**2 + dy**2)
-                if distance < closest_distance:
-                    closest_distance = distance
+        self.boost_timer = timers.schedule(SCOOBY_SNACK_BOOST_DURATION, self.end_speed_boost)
+        
+    def end_speed_boost(self):
+        self.has_speed_boost = False
+        self.boost_timer = None
+        self.speed = PLAYER_SPEED
+        
+    def update_courage(self, monster_index):
+        # Decrease courage when near monsters (only count active monsters)
+        _, closest_sq = monster_index.nearest(self.x, self.y, 200, is_active_monster)
         
         # Update courage based on distance to nearest monster
-        if closest_distance < 100:
-            self.courage = max(0, self.courage - 1)
-        elif closest_distance < 200:
-            self.courage = max(0, self.courage - 0.5)
+        if closest_sq < 100**2:
+            self.courage = max(0, self.courage - COURAGE_DRAIN_NEAR)
+        elif closest_sq < 200**2:
+            self.courage = max(0, self.courage - COURAGE_DRAIN_FAR)
         else:
-            self.courage = min(100, self.courage + 0.2)
+            self.courage = min(100, self.courage + COURAGE_RECOVERY)
         
         # Game over if courage reaches zero
         return self.courage <= 0
 
 # Friend class (Shaggy, Velma, Daphne, Fred)
 class Friend(Character):
+    __slots__ = ("name", "is_found", "on_trail", "follow_distance")
+    
     def __init__(self, x, y, image, name):
         super().__init__(x, y, image, FRIEND_SPEED)
         self.name = name
         self.is_found = False
+        self.on_trail = False  # Locked onto the player's breadcrumb trail
         self.follow_distance = TILE_SIZE * 1.5
         
-    def follow(self, target_x, target_y, forest):
+    def follow(self, trail, position):
         if not self.is_found:
             return
             
-        # Calculate direction to target
-        dx = target_x - self.x
-        dy = target_y - self.y
-        distance = math.sqrt(dx**2 + dy**2)
+        # Sit a fixed distance back along the player's trail; the player already walked
+        # it, so there's nothing to collide with
+        target_x, target_y = trail.at(int(self.follow_distance * (position + 1) / trail.spacing))
         
-        # Only move if we're too far from the target
-        if distance > self.follow_distance:
-            # Normalize direction vector
-            if distance > 0:
-                dx /= distance
-                dy /= distance
-                
-            # Calculate new position
-            new_x = self.x + dx * self.speed
-            new_y = self.y + dy * self.speed
-            
-            # Check for collisions with forest and trees
-            if self.can_move_to(new_x, self.y, forest):
-                self.x = new_x
-            if self.can_move_to(self.x, new_y, forest):
-                self.y = new_y
-                
-            self.update()
-    
-    def can_move_to(self, x, y, forest):
-        # Check forest boundaries
-        if x < 0 or y < 0 or x > forest.width - self.width or y > forest.height - self.height:
-            return False
-        
-        # Check collision with trees
-        test_rect = pygame.Rect(x, y, self.width, self.height)
-        for tree in forest.trees:
-            if test_rect.colliderect(tree):
-                return False
-                
-        return True
+        if self.on_trail:
+            self.x, self.y = target_x, target_y
+        else:
+            # Just found: catch up with our spot on the trail first
+            dx = target_x - self.x
+            dy = target_y - self.y
+            distance = math.sqrt(dx**2 + dy**2)
+            catch_up_speed = self.speed * 4
+            if distance <= catch_up_speed:
+                self.x, self.y = target_x, target_y
+                self.on_trail = True
+            else:
+                self.x += dx / distance * catch_up_speed
+                self.y += dy / distance * catch_up_speed
 
 # Monster class
 class Monster(Character):
-    def __init__(self, x, y, patrol_type="random"):
-        super().__init__(x, y, MONSTER_IMG, MONSTER_SPEED)
+    __slots__ = ("rng", "timers", "patrol_type", "is_stunned", "stun_timer", "direction_timer", "last_update")
+    
+    def __init__(self, x, y, patrol_type="random", rng=None, timers=None):
+        super().__init__(x, y, MONSTER_IMG, MONSTER_SPEED, rng)
+        self.rng = rng or random  # Random stream for AI decisions
+        self.timers = timers  # Game timer wheel (direction changes and stun recovery)
         self.patrol_type = patrol_type
-        self.direction_change_timer = 0
         self.is_stunned = False
-        self.stun_end_time = 0
+        self.stun_timer = None  # Pending stun recovery
+        self.direction_timer = None  # Pending patrol direction change
+        self.last_update = 0  # Game frame of its last AI update (see Game.monster_updates)
+        
+        # Random patrols pick a new direction every few seconds, starting right away
+        if self.patrol_type == "random" and self.timers:
+            self.direction_timer = self.timers.schedule(0, self.change_direction)
+            
+    def change_direction(self):
+        self.direction = self.rng.choice(DIRECTIONS)
+        self.direction_timer = self.timers.schedule(self.rng.randint(1000, 3000), self.change_direction)
         
-    def update_monster(self, forest, player_x=None, player_y=None):
+    def update_monster(self, forest, player_x=None, player_y=None, in_chase_range=None, steps=1):
+        # steps: ticks to cover in this update (monsters far from the player think less
+        # often and move that much further each time)
         # Skip movement if stunned
         if self.is_stunned:
-            if pygame.time.get_ticks() > self.stun_end_time:
-                self.is_stunned = False
-            else:
-                # Just update the rectangle position without calling any update method
-                self.rect.x = self.x
-                self.rect.y = self.y
-                return
-        
-        # Change direction periodically for random patrol
-        if self.patrol_type == "random":
-            current_time = pygame.time.get_ticks()
-            if current_time > self.direction_change_timer:
-                self.direction = random.choice(["up", "down", "left", "right"])
-                self.direction_change_timer = current_time + random.randint(1000, 3000)
+            return
+        speed = self.speed * steps
                 
         # Move based on patrol type
         if self.patrol_type == "chase" and player_x is not None and player_y is not None:
-            # Chase the player if they're within range
+            # Chase the player if they're within range (the caller can pass this in
+            # from a proximity query)
             dx = player_x - self.x
             dy = player_y - self.y
-            distance = math.sqrt(dx**2 + dy**2)
+            if in_chase_range is None:
+                in_chase_range = dx**2 + dy**2 < MONSTER_CHASE_RANGE**2
             
-            if distance < 200:  # Chase range
+            if in_chase_range:
+                # Follow the shared navigation field around trees when it reaches us,
+                # otherwise head straight for the player
+                target = forest.nav_field.target_for(self.x, self.y)
+                if target:
+                    dx = target[0] - self.x
+                    dy = target[1] - self.y
+                distance = math.sqrt(dx**2 + dy**2)
+                    
                 # Normalize direction vector
-                if distance > 0:
+                if distance > speed:
                     dx /= distance
                     dy /= distance
+                elif distance > 0:
+                    dx /= speed
+                    dy /= speed
                     
                 # Apply movement
-                new_x = self.x + dx * self.speed
-                new_y = self.y + dy * self.speed
+                new_x = self.x + dx * speed
+                new_y = self.y + dy * speed
                 
                 # Check for collisions with forest and trees
                 if self.can_move_to(new_x, self.y, forest):
@@ -999,24 +1367,23 @@ class Monster(Character):
                 if self.can_move_to(self.x, new_y, forest):
                     self.y = new_y
             else:
-                self.move_in_direction(forest)
+                self.move_in_direction(forest, steps)
         else:
-            self.move_in_direction(forest)
-            
-        # Update rectangle position
-        self.rect.x = self.x
-        self.rect.y = self.y
+            self.move_in_direction(forest, steps)
         
-    def move_in_direction(self, forest):
+    def move_in_direction(self, forest, steps=1):
+        # Several steps are one jump along the patrol direction with a single collision
+        # check (steps stay well under a tree's width, so nothing gets tunneled through)
+        speed = self.speed * steps
         dx, dy = 0, 0
         if self.direction == "up":
-            dy = -self.speed
+            dy = -speed
         elif self.direction == "down":
-            dy = self.speed
+            dy = speed
         elif self.direction == "left":
-            dx = -self.speed
+            dx = -speed
         elif self.direction == "right":
-            dx = self.speed
+            dx = speed
             
         # Apply movement
         new_x = self.x + dx
@@ -1045,34 +1412,36 @@ class Monster(Character):
                 self.direction = "up"
     
     def can_move_to(self, x, y, forest):
-        # Check forest boundaries
-        if x < 0 or y < 0 or x > forest.width - self.width or y > forest.height - self.height:
-            return False
-        
-        # Check collision with trees
-        test_rect = pygame.Rect(x, y, self.width, self.height)
-        for tree in forest.trees:
-            if test_rect.colliderect(tree):
-                return False
-                
-        return True
+        # Check forest boundaries and trees
+        return not forest.blocks(pygame.Rect(x, y, self.width, self.height))
         
     def stun(self):
+        self.timers.cancel(self.stun_timer)
         self.is_stunned = True
-        self.stun_end_time = pygame.time.get_ticks() + MONSTER_STUN_DURATION
+        self.stun_timer = self.timers.schedule(MONSTER_STUN_DURATION, self.recover)
         
-    def draw(self, screen, camera_x, camera_y):
+    def recover(self):
+        self.is_stunned = False
+        self.stun_timer = None
+        
+    def draw(self, screen, camera_x, camera_y, alpha=1.0):
         if self.is_stunned:
             # Draw a stunned version (add visual indicator)
             stunned_img = self.image.copy()
             pygame.draw.line(stunned_img, YELLOW, (0, 0), (self.width, self.height), 3)
             pygame.draw.line(stunned_img, YELLOW, (0, self.height), (self.width, 0), 3)
-            screen.blit(stunned_img, (self.x - camera_x, self.y - camera_y))
+            x, y = self.render_position(alpha)
+            screen.blit(stunned_img, (x - camera_x, y - camera_y))
         else:
-            super().draw(screen, camera_x, camera_y)
+            super().draw(screen, camera_x, camera_y, alpha)
+
+def is_active_monster(monster):
+    return not monster.is_stunned
 
 # Collectible class
 class Collectible:
+    __slots__ = ("x", "y", "image", "type", "width", "height", "cell", "slot", "origin")
+    
     def __init__(self, x, y, image, type_name):
         self.x = x
         self.y = y
@@ -1080,34 +1449,377 @@ class Collectible:
         self.type = type_name
         self.width = image.get_width()
         self.height = image.get_height()
-        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.cell = None  # Bucket and slot in the CollectibleStore holding this collectible
+        self.slot = 0
+        self.origin = None  # (chunk, index) when generated by a StreamingForest chunk
+        
+    @property
+    def rect(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
         
     def draw(self, screen, camera_x, camera_y):
         screen.blit(self.image, (self.x - camera_x, self.y - camera_y))
 
+# Spatial grid class (buckets items by cell for fast neighborhood queries)
+class SpatialGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> list of items
+        
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+        
+    def insert(self, item, x, y):
+        self.cells.setdefault(self.cell_of(x, y), []).append(item)
+        
+    def query(self, left, top, right, bottom):
+        # Yield every item bucketed in a cell that overlaps the given box
+        min_cx, min_cy = self.cell_of(left, top)
+        max_cx, max_cy = self.cell_of(right, bottom)
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    yield from bucket
+                    
+    def neighbors(self, x, y):
+        # Items in the 3x3 block of cells around (x, y)
+        return self.query(x - self.cell_size, y - self.cell_size, 
+                          x + self.cell_size, y + self.cell_size)
+
+# Proximity grid class (spatial grid for entities that move every tick)
+class ProximityGrid(SpatialGrid):
+    def __init__(self, cell_size):
+        super().__init__(cell_size)
+        self.item_cells = {}  # item -> cell it is currently bucketed in
+        
+    def rebuild(self, items):
+        self.cells = {}
+        self.item_cells = {}
+        for item in items:
+            self.update(item)
+            
+    def update(self, item):
+        # Re-bucket an entity after it moved; a no-op unless it crossed into a new cell
+        cell = self.cell_of(item.x, item.y)
+        old_cell = self.item_cells.get(item)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self.cells[old_cell].remove(item)
+        self.cells.setdefault(cell, []).append(item)
+        self.item_cells[item] = cell
+        
+    def within(self, x, y, radius, accept=None):
+        # Entities closer than radius to (x, y), compared with squared distances
+        radius_sq = radius * radius
+        found = []
+        for item in self.query(x - radius, y - radius, x + radius, y + radius):
+            if (item.x - x)**2 + (item.y - y)**2 < radius_sq and (accept is None or accept(item)):
+                found.append(item)
+        return found
+        
+    def nearest(self, x, y, radius, accept=None):
+        # Closest entity within radius as (item, squared distance), or (None, inf)
+        nearest_item, nearest_sq = None, float('inf')
+        radius_sq = radius * radius
+        for item in self.query(x - radius, y - radius, x + radius, y + radius):
+            distance_sq = (item.x - x)**2 + (item.y - y)**2
+            if distance_sq < nearest_sq and distance_sq < radius_sq and (accept is None or accept(item)):
+                nearest_item, nearest_sq = item, distance_sq
+        return nearest_item, nearest_sq
+
+# Collectible store class (collectibles bucketed by grid cell with O(1) removal)
+class CollectibleStore(SpatialGrid):
+    def __init__(self, cell_size=TILE_SIZE * 2):
+        super().__init__(cell_size)
+        self.count = 0
+        self.version = 0  # Bumped on every add/remove so observers can tell nothing changed
+        
+    def __len__(self):
+        return self.count
+        
+    def __iter__(self):
+        for bucket in list(self.cells.values()):
+            yield from bucket
+            
+    def add(self, collectible):
+        # Remember where the collectible lives so it can be removed without a search
+        collectible.cell = self.cell_of(collectible.x, collectible.y)
+        bucket = self.cells.setdefault(collectible.cell, [])
+        collectible.slot = len(bucket)
+        bucket.append(collectible)
+        self.count += 1
+        self.version += 1
+        
+    def remove(self, collectible):
+        # Swap-remove: move the bucket's last collectible into the freed slot
+        bucket = self.cells[collectible.cell]
+        last = bucket.pop()
+        if last is not collectible:
+            bucket[collectible.slot] = last
+            last.slot = collectible.slot
+        self.count -= 1
+        self.version += 1
+        
+    def touching(self, rect):
+        # Collectibles overlapping rect; only the cells around it are checked
+        # (collectibles are bucketed by their top-left corner and are at most a tile wide)
+        return [collectible for collectible in self.query(rect.x - TILE_SIZE, rect.y - TILE_SIZE, 
+                                                          rect.right, rect.bottom)
+                if rect.colliderect(collectible.rect)]
+                
+    def visible(self, camera_x, camera_y):
+        # Collectibles in the buckets that overlap the screen
+        return self.query(camera_x - TILE_SIZE, camera_y - TILE_SIZE, 
+                          camera_x + SCREEN_WIDTH, camera_y + SCREEN_HEIGHT)
+
+# Free space index class (precomputed spawn points where an entity fits between trees)
+class FreeSpaceIndex:
+    def __init__(self, forest, width, height, step=TILE_SIZE // 2):
+        self.width = width
+        self.height = height
+        self.step = step
+        
+        # Lattice of candidate top-left corners covering the forest
+        self.cols = (forest.width - width) // step + 1
+        self.rows = (forest.height - height) // step + 1
+        
+        # Rasterize every tree onto the lattice: mark each corner whose entity rect
+        # would overlap it (x > tree.x - width and x < tree.right, same for y)
+        blocked = bytearray(self.cols * self.rows)
+        for tree in forest.trees:
+            min_cx = max(0, (tree.x - width) // step + 1)
+            max_cx = min(self.cols - 1, (tree.right - 1) // step)
+            min_cy = max(0, (tree.y - height) // step + 1)
+            max_cy = min(self.rows - 1, (tree.bottom - 1) // step)
+            if min_cx > max_cx:
+                continue
+            for cy in range(min_cy, max_cy + 1):
+                row = cy * self.cols
+                blocked[row + min_cx:row + max_cx + 1] = b"\x01" * (max_cx - min_cx + 1)
+                
+        # Walkable mask and flat list of the free lattice indices (the walkable cells)
+        self.walkable = blocked.translate(FREE_CELL_TABLE)
+        self.free = array("i", compress(range(len(blocked)), self.walkable))
+        
+    def position(self, index):
+        return (index % self.cols) * self.step, (index // self.cols) * self.step
+        
+    def nearest_walkable(self, x, y):
+        # Index of a walkable lattice corner next to pixel (x, y), or None
+        cx, cy = int(x // self.step), int(y // self.step)
+        for nx, ny in ((cx, cy), (cx + 1, cy), (cx, cy + 1), (cx + 1, cy + 1)):
+            if 0 <= nx < self.cols and 0 <= ny < self.rows and self.walkable[ny * self.cols + nx]:
+                return ny * self.cols + nx
+        return None
+        
+    def accepts(self, x, y, spawns, bounds, avoid, min_distance_sq, spacing_sq, region):
+        if bounds and not (bounds[0] <= x <= bounds[2] and bounds[1] <= y <= bounds[3]):
+            return False
+        if avoid and (x - avoid[0])**2 + (y - avoid[1])**2 < min_distance_sq:
+            return False
+        if region and not region(x, y):
+            return False
+        for sx, sy in spawns:
+            if (x - sx)**2 + (y - sy)**2 < max(spacing_sq, 1):
+                return False
+        return True
+                    
+    def sample(self, count, bounds=None, avoid=None, min_distance=0, spacing=0, region=None, rng=random):
+        # bounds: (min_x, min_y, max_x, max_y) for the top-left corner
+        # avoid/min_distance: keep spawns at least this far from a point (e.g. player start)
+        # spacing: minimum distance between the spawns returned by this call
+        # region: optional mask callable(x, y) -> bool
+        constraints = (bounds, avoid, min_distance * min_distance, spacing * spacing, region)
+        spawns = []
+        if not self.free:
+            return spawns
+            
+        # Fast path: uniform O(1) picks from the free cells, rejecting the ones
+        # that break a constraint
+        attempts = count * 50
+        while len(spawns) < count and attempts > 0:
+            attempts -= 1
+            x, y = self.position(self.free[rng.randrange(len(self.free))])
+            if self.accepts(x, y, spawns, *constraints):
+                spawns.append((x, y))
+                
+        if len(spawns) < count:
+            # The constraints exclude most of the map, so filter the candidates once
+            # and swap-remove each pick; this always terminates even if space runs out
+            candidates = [self.position(i) for i in self.free]
+            while len(spawns) < count and candidates:
+                i = rng.randrange(len(candidates))
+                x, y = candidates[i]
+                candidates[i] = candidates[-1]
+                candidates.pop()
+                if self.accepts(x, y, spawns, *constraints):
+                    spawns.append((x, y))
+            
+        return spawns
+
+# Forest navigation field class (shared distance map to the player for chasing monsters)
+class ForestNavField:
+    # Lattice steps a chaser can take, indexed by the value stored in next_step
+    STEPS = [(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)]
+    
+    def __init__(self, forest, radius=MONSTER_CHASE_RANGE * 2):
+        # Walkable grid for a monster-sized entity (see FreeSpaceIndex)
+        self.lattice = forest.free_space(TILE_SIZE, TILE_SIZE)
+        self.max_depth = int(radius // self.lattice.step)  # Only map this many steps around the player
+        size = self.lattice.cols * self.lattice.rows
+        self.distance = array("i", [0]) * size
+        self.next_step = bytearray(size)  # Index into STEPS toward the player
+        # A cell's distance is only valid if its stamp matches the current generation,
+        # so a recompute never has to clear the whole map
+        self.stamp = array("i", [0]) * size
+        self.generation = 0
+        self.target_cell = None
+        
+    def update(self, player_x, player_y):
+        cell = self.lattice.nearest_walkable(player_x, player_y)
+        if cell is None or cell == self.target_cell:
+            return  # Only recompute when the player changes cell
+        self.target_cell = cell
+        
+        # Breadth-first search out from the player, bounded to max_depth steps, so each
+        # move touches only the region around the player however big the forest is
+        self.generation += 1
+        generation, stamp = self.generation, self.stamp
+        distance, next_step = self.distance, self.next_step
+        cols, rows, walkable = self.lattice.cols, self.lattice.rows, self.lattice.walkable
+        stamp[cell] = generation
+        distance[cell] = 0
+        next_step[cell] = 0
+        queue = deque([cell])
+        while queue:
+            current = queue.popleft()
+            next_distance = distance[current] + 1
+            if next_distance > self.max_depth:
+                continue
+            x, y = current % cols, current // cols
+            # The neighbor to the left steps right (1) to get here, and so on
+            for neighbor, step, inside in ((current - 1, 1, x > 0), (current + 1, 2, x < cols - 1),
+                                           (current - cols, 3, y > 0), (current + cols, 4, y < rows - 1)):
+                if inside and walkable[neighbor] and stamp[neighbor] != generation:
+                    stamp[neighbor] = generation
+                    distance[neighbor] = next_distance
+                    next_step[neighbor] = step
+                    queue.append(neighbor)
+                    
+    def target_for(self, x, y):
+        # Top-left position of the next lattice corner on the way to the player,
+        # or None if the player isn't reachable within the mapped region
+        cell = self.lattice.nearest_walkable(x, y)
+        if cell is None or self.stamp[cell] != self.generation or self.distance[cell] == 0:
+            return None
+        step_x, step_y = self.STEPS[self.next_step[cell]]
+        next_x, next_y = self.lattice.position(cell)
+        return next_x + step_x * self.lattice.step, next_y + step_y * self.lattice.step
+
+def plant_trees(forest, real_x, real_y, grid_size, rng):
+    # Add some randomness to tree placement
+    if rng.random() < 0.7:  # 70% chance to place a tree
+        # Place 1-2 trees in this grid cell with spacing
+        num_trees = rng.randint(1, 2)
+        for _ in range(num_trees):
+            tree_x = real_x + rng.randint(0, grid_size - TILE_SIZE)
+            tree_y = real_y + rng.randint(0, grid_size - TILE_SIZE)
+            
+            # Check if this position would block a path
+            # (the tree grid cells are as wide as the spacing, so only
+            # the 3x3 cells around the candidate can hold a neighbor)
+            is_blocking = False
+            for existing_tree in forest.tree_grid.neighbors(tree_x, tree_y):
+                if abs(existing_tree.x - tree_x) < TILE_SIZE*1.5 and \
+                   abs(existing_tree.y - tree_y) < TILE_SIZE*1.5:
+                    is_blocking = True
+                    break
+                    
+            if not is_blocking:
+                forest.add_tree(tree_x, tree_y)
+
 # Forest class
 class Forest:
-    def __init__(self, width, height):
+    bounded = True  # The world ends at width x height
+    
+    def __init__(self, width, height, rng=None, layout=None):
         self.width = width
         self.height = height
+        self.rng = rng or random  # Random stream for world generation
         self.trees = []
-        self.collectibles = []
+        self.tree_grid = SpatialGrid(TILE_SIZE * 1.5)  # Trees bucketed by top-left corner
+        self.collectibles = CollectibleStore()
+        self.free_space_indexes = {}  # (width, height) -> FreeSpaceIndex
+        self.edges = (width, height)  # Where the world ends
+        
+        if layout is None:
+            # Generate trees (obstacles)
+            self.generate_trees()
+            
+            # Generate collectibles
+            self.generate_collectibles()
+        else:
+            # Saved game: trees as (x, y) and collectibles as (x, y, type code) rows
+            trees, collectibles = layout
+            for x, y in trees:
+                self.add_tree(x, y)
+            for x, y, code in collectibles:
+                type_name = COLLECTIBLE_TYPES[code]
+                image = SCOOBY_SNACK_IMG if type_name == "snack" else TRAP_IMG
+                self.collectibles.add(Collectible(x, y, image, type_name))
+        
+        # Shared pathfinding field toward the player for chasing monsters
+        self.nav_field = ForestNavField(self)
+        
+    def add_tree(self, x, y):
+        tree = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
+        self.trees.append(tree)
+        self.tree_grid.insert(tree, x, y)
+        
+    def blocks(self, rect):
+        # Check forest boundaries
+        if rect.x < 0 or rect.y < 0 or rect.right > self.width or rect.bottom > self.height:
+            return True
+        
+        # Check collision with trees (only trees whose top-left corner is within
+        # a tile of the rect can overlap it)
+        for tree in self.tree_grid.query(rect.x - TILE_SIZE, rect.y - TILE_SIZE, rect.right, rect.bottom):
+            if rect.colliderect(tree):
+                return True
+        return False
+        
+    def visible_trees(self, camera_x, camera_y):
+        return self.tree_grid.query(camera_x - TILE_SIZE, camera_y - TILE_SIZE, 
+                                    camera_x + SCREEN_WIDTH, camera_y + SCREEN_HEIGHT)
+        
+    def stream_around(self, left, top, right, bottom):
+        pass  # Everything is generated up front
         
-        # Generate trees (obstacles)
-        self.generate_trees()
+    def remove_collectible(self, collectible):
+        self.collectibles.remove(collectible)
         
-        # Generate collectibles
-        self.generate_collectibles()
+    def restore_collectible(self, collectible):
+        # Put a picked-up collectible back (when rewinding)
+        self.collectibles.add(collectible)
+        
+    def free_space(self, width, height):
+        # Build the spawn index for this entity size once, after the trees are placed
+        key = (width, height)
+        if key not in self.free_space_indexes:
+            self.free_space_indexes[key] = FreeSpaceIndex(self, width, height)
+        return self.free_space_indexes[key]
         
     def generate_trees(self):
         # Create a border of trees
         for x in range(0, self.width, TILE_SIZE):
-            self.trees.append(pygame.Rect(x, 0, TILE_SIZE, TILE_SIZE))
-            self.trees.append(pygame.Rect(x, self.height - TILE_SIZE, TILE_SIZE, TILE_SIZE))
+            self.add_tree(x, 0)
+            self.add_tree(x, self.height - TILE_SIZE)
             
         for y in range(0, self.height, TILE_SIZE):
-            self.trees.append(pygame.Rect(0, y, TILE_SIZE, TILE_SIZE))
-            self.trees.append(pygame.Rect(self.width - TILE_SIZE, y, TILE_SIZE, TILE_SIZE))
+            self.add_tree(0, y)
+            self.add_tree(self.width - TILE_SIZE, y)
             
         # Create a grid-based forest with clearer pathways
         grid_size = TILE_SIZE * 3  # Larger grid cells to ensure wider paths
@@ -1131,8 +1843,8 @@ class Forest:
         # Add some random clearings
         num_clearings = grid_width * grid_height // 15
         for _ in range(num_clearings):
-            cx = random.randint(1, grid_width-2)
-            cy = random.randint(1, grid_height-2)
+            cx = self.rng.randint(1, grid_width-2)
+            cy = self.rng.randint(1, grid_height-2)
             # Create a small clearing
             for dx in range(-1, 2):
                 for dy in range(-1, 2):
@@ -1151,63 +1863,21 @@ class Forest:
                     if (real_x > TILE_SIZE * 6 or real_y > TILE_SIZE * 6) and \
                        real_x < self.width - TILE_SIZE * 3 and real_y < self.height - TILE_SIZE * 3:
                         
-                        # Add some randomness to tree placement
-                        if random.random() < 0.7:  # 70% chance to place a tree
-                            # Place 1-2 trees in this grid cell with spacing
-                            num_trees = random.randint(1, 2)
-                            for _ in range(num_trees):
-                                tree_x = real_x + random.randint(0, grid_size - TILE_SIZE)
-                                tree_y = real_y + random.randint(0, grid_size - TILE_SIZE)
-                                
-                                # Check if this position would block a path
-                                is_blocking = False
-                                for existing_tree in self.trees:
-                                    if abs(existing_tree.x - tree_x) < TILE_SIZE*1.5 and \
-                                       abs(existing_tree.y - tree_y) < TILE_SIZE*1.5:
-                                        is_blocking = True
-                                        break
-                                        
-                                if not is_blocking:
-                                    self.trees.append(pygame.Rect(tree_x, tree_y, TILE_SIZE, TILE_SIZE))
+                        plant_trees(self, real_x, real_y, grid_size, self.rng)
     
     def generate_collectibles(self):
+        free_space = self.free_space(TILE_SIZE//2, TILE_SIZE//2)
+        bounds = (TILE_SIZE * 2, TILE_SIZE * 2, self.width - TILE_SIZE * 3, self.height - TILE_SIZE * 3)
+        
         # Create Scooby Snacks
         num_snacks = 10
-        for _ in range(num_snacks):
-            while True:
-                x = random.randint(TILE_SIZE * 2, self.width - TILE_SIZE * 3)
-                y = random.randint(TILE_SIZE * 2, self.height - TILE_SIZE * 3)
-                
-                # Check if position is valid (not colliding with trees)
-                valid_position = True
-                snack_rect = pygame.Rect(x, y, TILE_SIZE//2, TILE_SIZE//2)
-                for tree in self.trees:
-                    if snack_rect.colliderect(tree):
-                        valid_position = False
-                        break
-                        
-                if valid_position:
-                    self.collectibles.append(Collectible(x, y, SCOOBY_SNACK_IMG, "snack"))
-                    break
+        for x, y in free_space.sample(num_snacks, bounds=bounds, rng=self.rng):
+            self.collectibles.add(Collectible(x, y, SCOOBY_SNACK_IMG, "snack"))
         
         # Create trap items (to use against monsters)
         num_traps = 5
-        for _ in range(num_traps):
-            while True:
-                x = random.randint(TILE_SIZE * 2, self.width - TILE_SIZE * 3)
-                y = random.randint(TILE_SIZE * 2, self.height - TILE_SIZE * 3)
-                
-                # Check if position is valid (not colliding with trees)
-                valid_position = True
-                trap_rect = pygame.Rect(x, y, TILE_SIZE//2, TILE_SIZE//2)
-                for tree in self.trees:
-                    if trap_rect.colliderect(tree):
-                        valid_position = False
-                        break
-                        
-                if valid_position:
-                    self.collectibles.append(Collectible(x, y, TRAP_IMG, "trap"))
-                    break
+        for x, y in free_space.sample(num_traps, bounds=bounds, rng=self.rng):
+            self.collectibles.add(Collectible(x, y, TRAP_IMG, "trap"))
                     
     def draw(self, screen, camera_x, camera_y):
         # Draw sky background
@@ -1223,37 +1893,862 @@ class Forest:
                 screen.blit(GROUND_IMG, (x - offset_x, y - offset_y))
         
         # Draw trees using pixel art
-        for tree in self.trees:
+        for tree in self.visible_trees(camera_x, camera_y):
             if (tree.x + TILE_SIZE > camera_x and tree.x < camera_x + SCREEN_WIDTH and
                 tree.y + TILE_SIZE > camera_y and tree.y < camera_y + SCREEN_HEIGHT):
                 screen.blit(TREE_IMG, (tree.x - camera_x, tree.y - camera_y))
                 
-        # Draw collectibles
-        for collectible in self.collectibles:
+        # Draw collectibles (only the buckets on screen)
+        for collectible in self.collectibles.visible(camera_x, camera_y):
             collectible.draw(screen, camera_x, camera_y)
 
+
+# Forest chunk class (one square of a streaming forest, generated from the seed and its coordinates)
+class ForestChunk:
+    def __init__(self, seed, chunk_x, chunk_y, collected=(), level=None):
+        self.key = (chunk_x, chunk_y)
+        self.left = chunk_x * CHUNK_SIZE
+        self.top = chunk_y * CHUNK_SIZE
+        self.trees = []
+        self.tree_grid = SpatialGrid(TILE_SIZE * 1.5)
+        self.collectibles = []
+        
+        if level:
+            # Read this chunk's part of a level file
+            self.load_trees(level)
+            self.load_collectibles(level, collected)
+        else:
+            # Same seed and coordinates always give the same chunk, whatever the load order
+            rng = random.Random(f"{seed}:{chunk_x}:{chunk_y}")
+            self.generate_trees(rng)
+            self.generate_collectibles(rng, collected)
+        
+    def add_tree(self, x, y):
+        tree = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
+        self.trees.append(tree)
+        self.tree_grid.insert(tree, x, y)
+        
+    def generate_trees(self, rng):
+        # Same layout rules as Forest.generate_trees, on a world-aligned grid:
+        # every third grid row and column is a path, plus a random clearing
+        grid_size = TILE_SIZE * 3
+        cells = CHUNK_SIZE // grid_size
+        clearing_x = rng.randint(0, cells - 1)
+        clearing_y = rng.randint(0, cells - 1)
+        
+        for i in range(cells):
+            for j in range(cells):
+                real_x = self.left + i * grid_size
+                real_y = self.top + j * grid_size
+                
+                # Paths and the clearing stay open (grid cells never straddle chunks)
+                if (real_x // grid_size) % 3 == 2 or (real_y // grid_size) % 3 == 2:
+                    continue
+                if abs(i - clearing_x) <= 1 and abs(j - clearing_y) <= 1:
+                    continue
+                # Keep the starting area open
+                if -grid_size < real_x <= TILE_SIZE * 6 and -grid_size < real_y <= TILE_SIZE * 6:
+                    continue
+                plant_trees(self, real_x, real_y, grid_size, rng)
+                
+    def generate_collectibles(self, rng, collected):
+        # About the same density as the fixed forest: one snack and a bit over
+        # half a trap per chunk
+        items = [(SCOOBY_SNACK_IMG, "snack")] * rng.randint(0, 2)
+        if rng.random() < 0.6:
+            items.append((TRAP_IMG, "trap"))
+            
+        for index, (image, type_name) in enumerate(items):
+            for _ in range(10):
+                # Inside the chunk, so only this chunk's trees can overlap it
+                x = self.left + rng.randint(0, CHUNK_SIZE - TILE_SIZE//2)
+                y = self.top + rng.randint(0, CHUNK_SIZE - TILE_SIZE//2)
+                rect = pygame.Rect(x, y, TILE_SIZE//2, TILE_SIZE//2)
+                if not any(rect.colliderect(tree) for tree in self.tree_grid.neighbors(x, y)):
+                    break
+            else:
+                continue
+            if index not in collected:
+                collectible = Collectible(x, y, image, type_name)
+                collectible.origin = (self.key, index)
+                self.collectibles.append(collectible)
+                
+    def load_trees(self, level):
+        # Only the rows of the tree layer under this chunk are touched (see export_level
+        # for how a tile's value encodes its tree)
+        tiles = CHUNK_SIZE // TILE_SIZE
+        first_x, first_y = self.left // TILE_SIZE, self.top // TILE_SIZE
+        start_x, end_x = max(first_x, 0), min(first_x + tiles, level.cols)
+        if start_x >= end_x:
+            return  # Past the level's left or right edge
+        for tile_y in range(max(first_y, 0), min(first_y + tiles, level.rows)):
+            row = tile_y * level.cols
+            for tile_x, value in enumerate(level.trees[row + start_x:row + end_x], start_x):
+                if value:
+                    offset_x, offset_y = divmod(value - 1, TILE_SIZE)
+                    self.add_tree(tile_x * TILE_SIZE + offset_x, tile_y * TILE_SIZE + offset_y)
+                    
+    def load_collectibles(self, level, collected):
+        for index, (x, y, type_name) in enumerate(level.collectibles.get(self.key, ())):
+            if index not in collected:
+                image = SCOOBY_SNACK_IMG if type_name == "snack" else TRAP_IMG
+                collectible = Collectible(x, y, image, type_name)
+                collectible.origin = (self.key, index)
+                self.collectibles.append(collectible)
+
+# Streaming forest class (open-ended forest generated in chunks around the camera and entities)
+class StreamingForest(Forest):
+    bounded = False  # Chunks appear as they're needed
+    level = None  # Level file the chunks are read from instead of generated
+    overhang = 0  # How far a tree can reach past its own chunk
+    
+    def __init__(self, seed, home_width, home_height, max_chunks=STREAM_MAX_CHUNKS, collected=None):
+        self.seed = seed
+        # Friends and monsters spawn in a home region the size of the fixed forest
+        self.width = home_width
+        self.height = home_height
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()  # (chunk_x, chunk_y) -> ForestChunk, least recently used first
+        self.collected = collected or {}  # (chunk_x, chunk_y) -> indexes of collectibles already picked up
+        self.collectibles = CollectibleStore()
+        self.free_space_indexes = {}
+        self.edges = None  # No edges
+        
+        # Shared pathfinding field toward the player (covers the home region)
+        self.nav_field = ForestNavField(self)
+        
+    @property
+    def trees(self):
+        # Trees of the home region, for the spawn and navigation lattices
+        return [tree for chunk in self.chunks_in(0, 0, self.width, self.height) for tree in chunk.trees]
+        
+    def chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk:
+            self.chunks.move_to_end(key)
+            return chunk
+            
+        # Generate on first use and evict the least recently used chunk when over budget
+        chunk = ForestChunk(self.seed, chunk_x, chunk_y, self.collected.get(key, ()), self.level)
+        self.chunks[key] = chunk
+        for collectible in chunk.collectibles:
+            self.collectibles.add(collectible)
+        if len(self.chunks) > self.max_chunks:
+            _, evicted = self.chunks.popitem(last=False)
+            # Only the picked-up collectibles outlive the chunk (in self.collected);
+            # everything else is regenerated from the seed when it comes back
+            for collectible in evicted.collectibles:
+                if collectible.cell is not None:
+                    self.collectibles.remove(collectible)
+        return chunk
+        
+    def chunks_in(self, left, top, right, bottom):
+        return [self.chunk(chunk_x, chunk_y)
+                for chunk_x in range(int(left // CHUNK_SIZE), int(right // CHUNK_SIZE) + 1)
+                for chunk_y in range(int(top // CHUNK_SIZE), int(bottom // CHUNK_SIZE) + 1)]
+                
+    def blocks(self, rect):
+        # Trees only reach `overhang` past their chunk, so only the chunks under the rect
+        # (and that far up and left of it) matter
+        for chunk in self.chunks_in(rect.x - self.overhang, rect.y - self.overhang, 
+                                    rect.right - 1, rect.bottom - 1):
+            for tree in chunk.tree_grid.query(rect.x - TILE_SIZE, rect.y - TILE_SIZE, rect.right, rect.bottom):
+                if rect.colliderect(tree):
+                    return True
+        return False
+        
+    def visible_trees(self, camera_x, camera_y):
+        for chunk in self.chunks_in(camera_x - self.overhang, camera_y - self.overhang, 
+                                    camera_x + SCREEN_WIDTH, camera_y + SCREEN_HEIGHT):
+            yield from chunk.trees
+            
+    def stream_around(self, left, top, right, bottom):
+        self.chunks_in(left, top, right, bottom)
+        
+    def remove_collectible(self, collectible):
+        self.collectibles.remove(collectible)
+        collectible.cell = None
+        chunk_key, index = collectible.origin
+        self.collected.setdefault(chunk_key, set()).add(index)
+        
+    def restore_collectible(self, collectible):
+        chunk_key, index = collectible.origin
+        self.collected[chunk_key].discard(index)
+        if not self.collected[chunk_key]:
+            del self.collected[chunk_key]
+        # An unloaded chunk regenerates it on its own; a loaded one may have been
+        # regenerated without it in the meantime
+        chunk = self.chunks.get(chunk_key)
+        if chunk:
+            if collectible not in chunk.collectibles:
+                chunk.collectibles.append(collectible)
+            self.collectibles.add(collectible)
+
+# Level class (a level file mapped into memory: tile layers are read in place, so only
+# the pages under what's being looked at are ever loaded)
+class Level:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)  # Absolute, since saves and recordings refer back to it
+        self.file = SnapshotReader(path, LEVEL_MAGIC, LEVEL_VERSION, "level")
+        self.header = self.file.header
+        self.cols = self.header["forest"]["cols"]
+        self.rows = self.header["forest"]["rows"]
+        self.trees = self.file.array("trees")  # One value per tile, row by row (see export_level)
+        self.friend_spawns = list(self.file.rows("friend_spawns", 2))
+        self.monster_spawns = list(self.file.rows("monster_spawns", 2))
+        self.neighborhood = self.header["neighborhood"]  # Size and exit of its neighborhood, or None
+        
+        # Collectible spawns bucketed by chunk, so each chunk only looks at its own
+        self.collectibles = {}
+        for x, y, code in self.file.rows("collectibles", 3):
+            self.collectibles.setdefault((x // CHUNK_SIZE, y // CHUNK_SIZE), []).append(
+                (x, y, COLLECTIBLE_TYPES[code]))
+
+# Level forest class (a forest read from a level file chunk by chunk around the camera
+# and entities, so maps far bigger than the fixed forest stay cheap)
+class LevelForest(StreamingForest):
+    overhang = TILE_SIZE  # A tree's corner can be anywhere in its tile
+    
+    def __init__(self, level, max_chunks=STREAM_MAX_CHUNKS, collected=None):
+        self.level = level
+        # Spawn and navigation lattices cover a home region the size of the fixed forest
+        # (or the whole level if it's smaller)
+        width, height = level.cols * TILE_SIZE, level.rows * TILE_SIZE
+        super().__init__(None, min(width, TILE_SIZE * 40), min(height, TILE_SIZE * 30), 
+                         max_chunks, collected)
+        self.edges = (width, height)
+        
+    def blocks(self, rect):
+        # Check level boundaries, then the trees of the chunks around the rect
+        if rect.x < 0 or rect.y < 0 or rect.right > self.edges[0] or rect.bottom > self.edges[1]:
+            return True
+        return super().blocks(rect)
+
+# Level neighborhood class (a neighborhood whose road, house and street light layers stay
+# in the level file; drawing only reads the tiles on screen)
+class LevelNeighborhood(Neighborhood):
+    def __init__(self, level, rng=None):
+        section = level.neighborhood
+        self.houses = level.file.array("houses")
+        self.lights = level.file.array("lights")
+        super().__init__(section["cols"] * TILE_SIZE, section["rows"] * TILE_SIZE, rng, 
+                         (level.file.array("roads"), [], [], tuple(section["exit"])))
+        
+    def layer_tiles(self, layer, camera_x, camera_y, margin):
+        # Top-left corners of the set tiles of a layer on (or `margin` before) the screen
+        first_x = max(0, int((camera_x - margin) // TILE_SIZE) + 1)
+        last_x = min(self.cols, math.ceil((camera_x + SCREEN_WIDTH) / TILE_SIZE))
+        first_y = max(0, int((camera_y - margin) // TILE_SIZE) + 1)
+        last_y = min(self.rows, math.ceil((camera_y + SCREEN_HEIGHT) / TILE_SIZE))
+        positions = []
+        if first_x >= last_x:
+            return positions
+        for y in range(first_y, last_y):
+            row = y * self.cols
+            tiles = bytes(layer[row + first_x:row + last_x])
+            x = tiles.find(1)
+            while x != -1:
+                positions.append(((first_x + x) * TILE_SIZE, y * TILE_SIZE))
+                x = tiles.find(1, x + 1)
+        return positions
+        
+    def visible_houses(self, camera_x, camera_y):
+        return self.layer_tiles(self.houses, camera_x, camera_y, TILE_SIZE * 2)
+        
+    def visible_lights(self, camera_x, camera_y):
+        return self.layer_tiles(self.lights, camera_x, camera_y, TILE_SIZE)
+
+def export_level(path, forest, friend_spawns, monster_spawns, neighborhood=None):
+    # Write a fixed forest (and optionally a neighborhood) as a level file. A tree tile holds
+    # 0 for no tree, otherwise 1 + offset_x * TILE_SIZE + offset_y for the tree whose
+    # top-left corner is in that tile (so a hand-made map can just use 1)
+    cols, rows = -(-forest.width // TILE_SIZE), -(-forest.height // TILE_SIZE)
+    trees = array("H", [0]) * (cols * rows)
+    for tree in forest.trees:
+        tile_x, offset_x = divmod(tree.x, TILE_SIZE)
+        tile_y, offset_y = divmod(tree.y, TILE_SIZE)
+        trees[tile_y * cols + tile_x] = 1 + offset_x * TILE_SIZE + offset_y
+        
+    level = SnapshotWriter(LEVEL_MAGIC, LEVEL_VERSION)
+    level.header["forest"] = {"cols": cols, "rows": rows}
+    level.add_array("trees", "H", trees)
+    level.add_array("friend_spawns", "i", chain.from_iterable(friend_spawns))
+    level.add_array("monster_spawns", "i", chain.from_iterable(monster_spawns))
+    level.add_array("collectibles", "i", chain.from_iterable(
+        (collectible.x, collectible.y, COLLECTIBLE_TYPES.index(collectible.type)) 
+        for collectible in forest.collectibles))
+        
+    # Neighborhood layers: one byte per tile, 1 where there's a road, house or light
+    level.header["neighborhood"] = None
+    if neighborhood:
+        level.header["neighborhood"] = {"cols": neighborhood.cols, "rows": neighborhood.rows, 
+                                        "exit": list(neighborhood.exit_position)}
+        level.add_array("roads", "B", neighborhood.road_map)
+        for name, positions in (("houses", neighborhood.house_positions), 
+                                ("lights", neighborhood.street_lights)):
+            layer = bytearray(neighborhood.cols * neighborhood.rows)
+            for x, y in positions:
+                layer[y // TILE_SIZE * neighborhood.cols + x // TILE_SIZE] = 1
+            level.add_array(name, "B", layer)
+    level.write(path)
+
+                                  
+# Friends to rescue, in spawn order
+FRIEND_DATA = [
+    ("Shaggy", SHAGGY_IMG),
+    ("Velma", VELMA_IMG),
+    ("Daphne", DAPHNE_IMG),
+    ("Fred", FRED_IMG)
+]
+
+# World class (everything a new game needs that is slow to build: the forest and the
+# friend and monster spawns)
+class World:
+    def __init__(self, seed, infinite, width, height, level=None):
+        self.rng = GameRNG(seed)
+        if level:
+            # A level file brings its own forest and spawns
+            self.forest = LevelForest(level)
+            self.friend_spawns = level.friend_spawns
+            self.monster_spawns = level.monster_spawns
+            return
+        if infinite:
+            self.forest = StreamingForest(self.rng.stream("forest").randrange(2**31), width, height)
+        else:
+            self.forest = Forest(width, height, self.rng.stream("forest"))
+            
+        # Friends away from the start position, monsters a bit further still
+        free_space = self.forest.free_space(TILE_SIZE, TILE_SIZE)
+        spawn_rng = self.rng.stream("spawn")
+        self.friend_spawns = free_space.sample(len(FRIEND_DATA), 
+                                               bounds=(TILE_SIZE * 8, TILE_SIZE * 8, 
+                                                       width - TILE_SIZE * 3, height - TILE_SIZE * 3),
+                                               spacing=TILE_SIZE * 2,
+                                               rng=spawn_rng)
+        self.monster_spawns = free_space.sample(NUM_MONSTERS, 
+                                                bounds=(TILE_SIZE * 5, TILE_SIZE * 5, 
+                                                        width - TILE_SIZE * 3, height - TILE_SIZE * 3),
+                                                avoid=(TILE_SIZE * 2, TILE_SIZE * 2),  # Player start position
+                                                min_distance=TILE_SIZE * 5,
+                                                spacing=TILE_SIZE * 2,
+                                                rng=spawn_rng)
+
+# World pool class (builds upcoming worlds on a background thread so a restart only
+# has to swap one in)
+class WorldPool:
+    def __init__(self, width=TILE_SIZE * 40, height=TILE_SIZE * 30):
+        self.width = width
+        self.height = height
+        # A thread rather than a process: worlds hold sprite surfaces, which can't be pickled
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="world-pool")
+        self.pending = {}  # (seed, infinite) -> Future of a World
+        
+    def prepare(self, seed, infinite):
+        # Keyed by the forest kind too: a loaded save may switch between the two
+        if (seed, infinite) not in self.pending:
+            self.pending[seed, infinite] = self.executor.submit(World, seed, infinite, 
+                                                                self.width, self.height)
+            
+    def take(self, seed, infinite):
+        # The world for seed (waiting for it if it's still being built), or None if it
+        # was never requested; worlds for other seeds are dropped
+        future = self.pending.pop((seed, infinite), None)
+        for other in self.pending.values():
+            other.cancel()
+        self.pending.clear()
+        return future.result() if future else None
+
+# Scene preloader class (builds upcoming scenes on a background thread while the
+# current one plays)
+class ScenePreloader:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene-preloader")
+        self.pending = {}  # scene name -> Future
+        
+    def prepare(self, name, builder, *args):
+        self.pending[name] = self.executor.submit(builder, *args)
+        
+    def take(self, name, builder, *args):
+        # Ready-check at the transition: a finished scene is swapped in; one still being
+        # built is waited for (it's already partway done); one never prepared is built here
+        future = self.pending.pop(name, None)
+        if future is None or future.cancelled():
+            return builder(*args)
+        return future.result()
+        
+    def clear(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+
+# Frame capture class (the rendered frame as NumPy views, plus optional downsampled and
+# grayscale copies in reusable buffers and a streaming sink)
+class FrameCapture:
+    GRAY_WEIGHTS = (77, 150, 29)  # Luma weights out of 256
+    
+    def __init__(self, surface, scale=1, grayscale=False, sink_path=None, fps=FPS):
+        if np is None:
+            raise ImportError("FrameCapture needs NumPy")
+        self.surface = surface
+        self.scale = scale
+        self.use_grayscale = grayscale
+        width, height = surface.get_size()
+        self.height = height // scale
+        self.width = width // scale
+        self.small = np.empty((self.height, self.width, 3), dtype=np.uint8) if scale > 1 else None
+        self.gray_buffers = {}  # (height, width) -> (gray, sum, term)
+        channels = 1 if grayscale else 3
+        self.sink = FrameSink(sink_path, self.width, self.height, channels, fps) if sink_path else None
+        
+    def pixels(self):
+        # (height, width, 3) view straight into the surface, no copy. The surface is
+        # locked while the view is alive, so drop it before drawing again
+        return pygame.surfarray.pixels3d(self.surface).transpose(1, 0, 2)
+        
+    def downsampled(self):
+        # Every scale-th pixel, copied into the reusable buffer
+        scale = self.scale
+        pixels = self.pixels()
+        np.copyto(self.small, pixels[:self.height * scale:scale, :self.width * scale:scale])
+        return self.small
+        
+    def grayscale(self, rgb):
+        # Integer luma computed entirely in preallocated buffers
+        shape = rgb.shape[:2]
+        if shape not in self.gray_buffers:
+            self.gray_buffers[shape] = (np.empty(shape, dtype=np.uint8), 
+                                        np.empty(shape, dtype=np.uint16), np.empty(shape, dtype=np.uint16))
+        gray, total, term = self.gray_buffers[shape]
+        red, green, blue = self.GRAY_WEIGHTS
+        np.multiply(rgb[..., 0], red, out=total, dtype=np.uint16)
+        np.multiply(rgb[..., 1], green, out=term, dtype=np.uint16)
+        total += term
+        np.multiply(rgb[..., 2], blue, out=term, dtype=np.uint16)
+        total += term
+        total >>= 8
+        np.copyto(gray, total, casting="unsafe")
+        return gray
+        
+    def frame(self):
+        # The configured variant: full-size view or downsampled copy, optionally gray
+        rgb = self.downsampled() if self.small is not None else self.pixels()
+        return self.grayscale(rgb) if self.use_grayscale else rgb
+        
+    def capture(self):
+        # Hand the current frame to the sink (a copy into a free buffer; encoding
+        # happens on the sink's thread)
+        if self.sink:
+            self.sink.submit(self.frame())
+            
+    def close(self):
+        if self.sink:
+            self.sink.close()
+
+# Frame sink class (writes captured frames on a background thread: raw frames piped to
+# ffmpeg, or a PNG sequence when the path has a %d-style pattern)
+class FrameSink:
+    def __init__(self, path, width, height, channels=3, fps=FPS, buffers=8):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.frames = 0  # Frames written
+        self.dropped = 0  # Frames skipped because the writer was behind
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        
+        # A fixed pool of frame buffers: the game loop never waits for the writer and
+        # never allocates, it drops a frame instead
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(np.empty(shape, dtype=np.uint8))
+        self.pending = queue.Queue()
+        
+        self.process = None
+        if "%" not in path:
+            pixel_format = "rgb24" if channels == 3 else "gray"
+            self.process = subprocess.Popen(["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", 
+                                             "-pix_fmt", pixel_format, "-s", f"{width}x{height}", 
+                                             "-r", str(fps), "-i", "-", path], stdin=subprocess.PIPE)
+        self.thread = threading.Thread(target=self.write_frames, daemon=True)
+        self.thread.start()
+        
+    def submit(self, frame):
+        try:
+            buffer = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return
+        np.copyto(buffer, frame)
+        self.pending.put(buffer)
+        
+    def write_frames(self):
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            if self.process:
+                self.process.stdin.write(buffer.data)
+            else:
+                rgb = buffer if self.channels == 3 else np.repeat(buffer[..., None], 3, axis=2)
+                image = pygame.image.frombuffer(rgb.tobytes(), (self.width, self.height), "RGB")
+                pygame.image.save(image, self.path % self.frames)
+            self.frames += 1
+            self.free.put(buffer)
+            
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        if self.process:
+            self.process.stdin.close()
+            self.process.wait()
+
+# Session recorder class (per-tick input, events and state hash of a live session)
+class SessionRecorder:
+    def __init__(self, path, seed, infinite, level=None):
+        self.stream = gzip.open(path, "wb")
+        flags = SESSION_INFINITE if infinite else 0
+        if level:
+            flags |= SESSION_LEVEL
+        self.stream.write(SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, flags, seed))
+        if level:
+            level_path = level.path.encode()
+            self.stream.write(SESSION_LEVEL_PATH.pack(len(level_path)) + level_path)
+        
+    def record(self, events, input_bits, state_hash):
+        # Only the events handle_events reacts to are kept
+        encoded = []
+        for event in events:
+            if event.type == pygame.QUIT:
+                encoded.append(SESSION_EVENT.pack(EVENT_QUIT, 0, 0))
+            elif event.type == pygame.KEYDOWN:
+                text = event.unicode.encode()[:255]
+                encoded.append(SESSION_EVENT.pack(EVENT_KEYDOWN, event.key, len(text)) + text)
+        self.stream.write(SESSION_TICK.pack(input_bits, len(encoded), state_hash))
+        self.stream.write(b"".join(encoded))
+        
+    def close(self):
+        self.stream.close()
+
+# Session replay class (feeds a recorded session back through Game.tick)
+class SessionReplay:
+    def __init__(self, path):
+        with gzip.open(path, "rb") as stream:
+            data = stream.read()
+        magic, version, flags, self.seed = SESSION_HEADER.unpack_from(data)
+        if magic != SESSION_MAGIC or version != SESSION_VERSION:
+            raise ValueError(f"{path} is not a recorded session")
+        self.infinite = bool(flags & SESSION_INFINITE)
+        offset = SESSION_HEADER.size
+        self.level_path = None
+        if flags & SESSION_LEVEL:
+            length, = SESSION_LEVEL_PATH.unpack_from(data, offset)
+            offset += SESSION_LEVEL_PATH.size
+            self.level_path = data[offset:offset + length].decode()
+            offset += length
+        
+        # Decode every tick up front so a timed replay only measures the game itself
+        self.ticks = list(self.decode_ticks(data, offset))
+        
+    def decode_ticks(self, data, offset):
+        while offset < len(data):
+            input_bits, count, state_hash = SESSION_TICK.unpack_from(data, offset)
+            offset += SESSION_TICK.size
+            events = []
+            for _ in range(count):
+                kind, key, length = SESSION_EVENT.unpack_from(data, offset)
+                offset += SESSION_EVENT.size
+                if kind == EVENT_QUIT:
+                    events.append(pygame.event.Event(pygame.QUIT))
+                else:
+                    text = data[offset:offset + length].decode()
+                    events.append(pygame.event.Event(pygame.KEYDOWN, key=key, unicode=text))
+                offset += length
+            yield events, input_bits, state_hash
+            
+    def run(self, render=False, capture=None):
+        # Returns (ticks played, seconds taken, first diverging tick or None)
+        game = Game(self.infinite, self.seed, level=Level(self.level_path) if self.level_path else None)
+        ticks = 0
+        start = time.perf_counter()
+        for events, input_bits, state_hash in self.ticks:
+            running = game.tick(events, input_bits)
+            ticks += 1
+            if game.state_hash() != state_hash:
+                return ticks, time.perf_counter() - start, ticks
+            if render:
+                game.render()
+                if capture:
+                    capture.capture()
+                pygame.display.flip()
+                pygame.event.pump()
+            if not running:
+                break
+        return ticks, time.perf_counter() - start, None
+
+# Rewind buffer class (the last few seconds of play as one full keyframe per second plus,
+# for every other tick, only the state values that changed since the tick before)
+class RewindBuffer:
+    def __init__(self, seconds=REWIND_SECONDS, keyframe_interval=FPS):
+        self.keyframe_interval = keyframe_interval
+        # Segments of [keyframe, ticks]: a keyframe and one (changed indexes, new values,
+        # pickups) entry per tick from it on; the oldest segment drops off as a whole
+        self.segments = deque(maxlen=seconds * FPS // keyframe_interval + 1)
+        self.previous = None  # State values of the newest tick
+        self.pickups = []  # Collectibles picked up since the last capture
+        
+    def clear(self):
+        self.segments.clear()
+        self.previous = None
+        self.pickups = []
+        
+    def picked_up(self, collectible):
+        self.pickups.append(collectible)
+        
+    def capture(self, game):
+        values = self.pack(game)
+        pickups, self.pickups = self.pickups, []
+        if self.previous is None or len(self.segments[-1][1]) == self.keyframe_interval:
+            self.segments.append((values, [(None, None, pickups)]))
+        else:
+            # Compared and gathered in C, so always-on capture stays cheap
+            changed = array("H", compress(range(len(values)), map(operator.ne, values, self.previous)))
+            self.segments[-1][1].append((changed, array("d", map(values.__getitem__, changed)), pickups))
+        self.previous = values
+        
+    def step_back(self, game):
+        # Return to the tick before the newest one; False when there's nothing older
+        if not self.segments or (len(self.segments) == 1 and len(self.segments[0][1]) == 1):
+            return False
+        _, ticks = self.segments[-1]
+        for collectible in ticks.pop()[2]:
+            game.forest.restore_collectible(collectible)
+        if not ticks:
+            self.segments.pop()
+            
+        # Rebuild the state from its keyframe and the changes since
+        keyframe, ticks = self.segments[-1]
+        values = array("d", keyframe)
+        for changed, new_values, _ in ticks[1:]:
+            for index, value in zip(changed, new_values):
+                values[index] = value
+        self.previous = values
+        self.unpack(game, values)
+        return True
+        
+    def pack(self, game):
+        player = game.player
+        values = array("d", (game.frame, game.now, game.time_elapsed, game.score, game.traps_available, 
+                             game.camera_x, game.camera_y, game.all_friends_found, 
+                             player.x, player.y, player.courage, player.has_speed_boost, 
+                             timer_due(player.boost_timer), player.trail.head))
+        for friend in game.friends:
+            position = player.found_friends.index(friend) if friend.is_found else -1
+            values.extend((friend.x, friend.y, friend.on_trail, position))
+        for monster in game.monsters:
+            values.extend((monster.x, monster.y, DIRECTIONS.index(monster.direction), monster.is_stunned, 
+                           timer_due(monster.stun_timer), timer_due(monster.direction_timer), 
+                           monster.last_update))
+        values += player.trail.xs
+        values += player.trail.ys
+        if game.boss_monster:
+            values.extend((game.boss_monster.x, game.boss_monster.y))
+        return values
+        
+    def unpack(self, game, values):
+        player = game.player
+        (game.frame, game.now, game.time_elapsed, game.score, game.traps_available, 
+         game.camera_x, game.camera_y, all_friends_found, 
+         player.x, player.y, player.courage, has_speed_boost, boost_due, trail_head) = values[:14]
+        game.frame = int(game.frame)
+        game.now = int(game.now)
+        game.score = int(game.score)
+        game.traps_available = int(game.traps_available)
+        game.all_friends_found = bool(all_friends_found)
+        player.has_speed_boost = bool(has_speed_boost)
+        player.trail.head = int(trail_head)
+        
+        # Timers are rescheduled from their due ticks on an emptied wheel
+        game.timers.reset(game.frame)
+        player.boost_timer = schedule_due(game.timers, boost_due, player.end_speed_boost)
+        
+        offset = 14
+        found = []
+        for friend in game.friends:
+            friend.x, friend.y, on_trail, position = values[offset:offset + 4]
+            friend.on_trail = bool(on_trail)
+            friend.is_found = position >= 0
+            if friend.is_found:
+                found.append((position, friend))
+            offset += 4
+        player.found_friends = [friend for _, friend in sorted(found, key=lambda item: item[0])]
+        
+        for monster in game.monsters:
+            (monster.x, monster.y, direction, is_stunned, stun_due, direction_due, 
+             last_update) = values[offset:offset + 7]
+            monster.direction = DIRECTIONS[int(direction)]
+            monster.last_update = int(last_update)
+            monster.is_stunned = bool(is_stunned)
+            monster.stun_timer = schedule_due(game.timers, stun_due, monster.recover)
+            monster.direction_timer = schedule_due(game.timers, direction_due, monster.change_direction)
+            offset += 7
+        game.monster_index.rebuild(game.monsters)
+        
+        capacity = player.trail.capacity
+        player.trail.xs[:] = values[offset:offset + capacity]
+        player.trail.ys[:] = values[offset + capacity:offset + 2 * capacity]
+        offset += 2 * capacity
+        if game.boss_monster:
+            game.boss_monster.x, game.boss_monster.y = values[offset:offset + 2]
+            game.boss_monster.rect.topleft = (game.boss_monster.x, game.boss_monster.y)
+
+def timer_due(timer):
+    return timer.due if timer else -1
+
+def schedule_due(timers, due, callback):
+    return timers.schedule_at(int(due), callback) if due >= 0 else None
+
+# Snapshot writer class (builds a saved game: the JSON header plus the packed arrays,
+# laid out so each array can be viewed straight out of the file)
+class SnapshotWriter:
+    def __init__(self, magic=SAVE_MAGIC, version=SAVE_VERSION):
+        self.magic = magic
+        self.version = version
+        self.header = {"byteorder": sys.byteorder, "arrays": {}}
+        self.arrays = []  # (name, array) in file order
+        
+    def add_array(self, name, typecode, values):
+        self.arrays.append((name, array(typecode, values)))
+        
+    def write(self, path):
+        # Array offsets are relative to the first aligned byte after the header, so
+        # they're known before the header itself is encoded
+        offset = 0
+        for name, values in self.arrays:
+            self.header["arrays"][name] = [values.typecode, offset, len(values)]
+            offset += len(values) * values.itemsize
+            offset += -offset % SAVE_ALIGN
+        header = json.dumps(self.header, separators=(",", ":")).encode()
+        
+        # Written next to the target and swapped in, so a failed save never clobbers
+        # the previous one
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as stream:
+            stream.write(SAVE_HEADER.pack(self.magic, self.version, len(header)))
+            stream.write(header)
+            for _, values in self.arrays:
+                stream.write(bytes(-stream.tell() % SAVE_ALIGN))
+                values.tofile(stream)
+        os.replace(temp_path, path)
+
+# Snapshot reader class (memory-maps a saved game; arrays are views into the file, so
+# only what the game keeps gets copied)
+class SnapshotReader:
+    def __init__(self, path, expected_magic=SAVE_MAGIC, expected_version=SAVE_VERSION, kind="saved game"):
+        with open(path, "rb") as stream:
+            self.map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = []
+        try:
+            magic, version, header_size = SAVE_HEADER.unpack_from(self.map)
+            if magic != expected_magic or version != expected_version:
+                raise ValueError(f"{path} is not a {kind}")
+            end = SAVE_HEADER.size + header_size
+            self.header = json.loads(self.map[SAVE_HEADER.size:end])
+            if self.header["byteorder"] != sys.byteorder:
+                raise ValueError(f"{path} was saved on a {self.header['byteorder']}-endian machine")
+        except (struct.error, ValueError):
+            self.map.close()
+            raise
+        self.start = end + -end % SAVE_ALIGN
+        
+    def array(self, name):
+        typecode, offset, count = self.header["arrays"][name]
+        start = self.start + offset
+        raw = memoryview(self.map)[start:start + count * array(typecode).itemsize]
+        return self.track(raw, raw.cast(typecode))[1]
+        
+    def rows(self, name, width):
+        # The array as rows of `width` values, e.g. (x, y) pairs
+        values = self.array(name)
+        return zip(*self.track(*(values[i::width] for i in range(width))))
+        
+    def track(self, *views):
+        # Every view must be released (newest first) before the map can be closed
+        self.views.extend(views)
+        return views
+        
+    def close(self):
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.map.close()
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc_info):
+        self.close()
                                   
 # Game class
 class Game:
-    def __init__(self):
-        self.state = GameState.MENU
+    def __init__(self, infinite=False, seed=None, world_pool=None, scene_preloader=None, save_file=None, 
+                 level=None):
+        self.infinite = infinite  # Open-ended streaming forest instead of the fixed one
+        self.world_pool = world_pool  # Builds the next restart's world in the background
+        self.scene_preloader = scene_preloader  # Builds the neighborhood and highway ahead of time
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont(None, FONT_SIZE)
+        self.riddle_text = "Are drop sets on leg day really needed? (press 'Enter' key to submit.)"
+        if save_file:
+            self.load(save_file)
+        else:
+            self.use_level(level)
+            self.reset(seed)
+            
+    def use_level(self, level):
+        # Play on a level file's maps (or, with None, on generated ones)
+        self.level = level
+        self.forest_width = TILE_SIZE * 40  # 2000 pixels
+        self.forest_height = TILE_SIZE * 30  # 1500 pixels
+        self.neighborhood_width = TILE_SIZE * 60  # 3000 pixels
+        self.neighborhood_height = TILE_SIZE * 40  # 2000 pixels
+        if level:
+            self.forest_width = level.cols * TILE_SIZE
+            self.forest_height = level.rows * TILE_SIZE
+            if level.neighborhood:
+                self.neighborhood_width = level.neighborhood["cols"] * TILE_SIZE
+                self.neighborhood_height = level.neighborhood["rows"] * TILE_SIZE
+                
+    def neighborhood_scene(self):
+        # Builder and arguments for this game's neighborhood
+        if self.level and self.level.neighborhood:
+            return LevelNeighborhood, (self.level, self.rng.stream("neighborhood"))
+        return Neighborhood, (self.neighborhood_width, self.neighborhood_height, self.rng.stream("neighborhood"))
+        
+    def reset(self, seed=None):
+        # Start a new game on the world for this seed, taken ready-made from the pool
+        # when it has been built already (a level's world has nothing to generate)
+        world = self.world_pool.take(seed, self.infinite) if self.world_pool and not self.level else None
+        if world is None:
+            world = World(seed, self.infinite, self.forest_width, self.forest_height, self.level)
+        self.rng = world.rng  # Seeded random streams (world, spawns, AI, rendering...)
+        self.seed = self.rng.seed
+        self.state = GameState.MENU
+        self.frame = 0  # Ticks simulated since this game started (paused time excluded)
+        self.now = 0  # Simulation time in milliseconds
+        self.timers = TimerWheel()  # Boost, stun and patrol timers, run on simulation time
+        self.rewind = RewindBuffer()  # The last REWIND_SECONDS of play, for stepping back
+        self.input_bits = 0  # Movement keys held this tick (INPUT_* bits)
         self.score = 0
         self.time_elapsed = 0
         self.traps_available = 0
-        self.riddle_text = "Are drop sets on leg day really needed? (press 'Enter' key to submit.)"
         self.answer_input = ""  # Player's typed answer
         
-        # Create environments
-        self.forest_width = TILE_SIZE * 40  # 2000 pixels
-        self.forest_height = TILE_SIZE * 30  # 1500 pixels
-        self.forest = Forest(self.forest_width, self.forest_height)
+        # Environments
+        self.forest = world.forest
         
         # Neighborhood (will be initialized when needed)
         self.neighborhood = None
-        self.neighborhood_width = TILE_SIZE * 60  # 3000 pixels
-        self.neighborhood_height = TILE_SIZE * 40  # 2000 pixels
         
         # Highway (will be initialized when needed)
         self.highway = None
@@ -1267,10 +2762,16 @@ class Game:
         self.mystery_machine = Character(TILE_SIZE * 2, TILE_SIZE * 3, MYSTERY_MACHINE_IMG, 0)
         
         # Create friends
-        self.friends = self.create_friends()
+        self.friends = self.create_friends(world.friend_spawns)
         
         # Create monsters
-        self.monsters = self.create_monsters()
+        self.monsters = self.create_monsters(world.monster_spawns)
+        
+        # Spatial index of the monsters for courage, traps and chase range, and the AI's
+        # update phases (see monster_updates)
+        self.monster_index = ProximityGrid(TILE_SIZE * 4)
+        self.monster_index.rebuild(self.monsters)
+        self.monster_phases = [self.monsters[phase::AI_COARSE_INTERVAL] for phase in range(AI_COARSE_INTERVAL)]
         
         # Create boss monster (will be initialized when needed)
         self.boss_monster = None
@@ -1278,6 +2779,9 @@ class Game:
         # Camera position
         self.camera_x = 0
         self.camera_y = 0
+        self.prev_camera_x = 0  # Camera at the start of the current tick (for interpolation)
+        self.prev_camera_y = 0
+        self.prev_highway_position = 0
         
         # Game status
         self.all_friends_found = False
@@ -1291,89 +2795,264 @@ class Game:
         self.turn_duration = 30  # frames for a turn
         self.turn_direction = 0  # -1 for left, 1 for right
         
-    def create_friends(self):
-        friends = []
-        
-        # Place friends randomly in the forest (away from start position)
-        friend_data = [
-            ("Shaggy", SHAGGY_IMG),
-            ("Velma", VELMA_IMG),
-            ("Daphne", DAPHNE_IMG),
-            ("Fred", FRED_IMG)
-        ]
+        self.next_seed = self.rng.stream("restart").randrange(2**32)
+        self.prepare_ahead()
         
-        for name, image in friend_data:
-            while True:
-                x = random.randint(TILE_SIZE * 8, self.forest_width - TILE_SIZE * 3)
-                y = random.randint(TILE_SIZE * 8, self.forest_height - TILE_SIZE * 3)
+    def prepare_ahead(self):
+        # The next restart's seed is already fixed, so its world can be built while
+        # this game plays
+        if self.world_pool and not self.level:
+            self.world_pool.prepare(self.next_seed, self.infinite)
+            
+        # Likewise the later scenes only depend on their own random streams
+        if self.scene_preloader:
+            self.scene_preloader.clear()
+            if self.neighborhood is None:
+                builder, args = self.neighborhood_scene()
+                self.scene_preloader.prepare("neighborhood", builder, *args)
+            if self.highway is None:
+                self.scene_preloader.prepare("highway", Highway, TILE_SIZE * 200, 
+                                             self.rng.stream("highway"), self.rng.stream("render"))
+        
+    def save(self, path):
+        # Scalars, entities and pending timers go in the header; the bulky parts (trees,
+        # roads, obstacles, the trail and the random states) as packed arrays
+        snapshot = SnapshotWriter()
+        header = snapshot.header
+        header.update(seed=self.seed, infinite=self.infinite, next_seed=self.next_seed, 
+                      state=self.state.value, frame=self.frame, now=self.now, tick=self.timers.tick, 
+                      score=self.score, time_elapsed=self.time_elapsed, traps=self.traps_available, 
+                      answer=self.answer_input, all_friends_found=self.all_friends_found, 
+                      transition_ready=self.transition_ready, game_over_reason=self.game_over_reason, 
+                      camera=[self.camera_x, self.camera_y], 
+                      driving=[self.highway_position, self.highway_lane, self.driving_speed, 
+                               self.is_turning, self.turn_progress, self.turn_duration, 
+                               self.turn_direction])
+        
+        # Entities, one row of fields each
+        player = self.player
+        header["player"] = [player.x, player.y, player.courage, player.has_speed_boost, 
+                            [self.friends.index(friend) for friend in player.found_friends], 
+                            player.trail.head]
+        snapshot.add_array("trail_x", "d", player.trail.xs)
+        snapshot.add_array("trail_y", "d", player.trail.ys)
+        header["friends"] = [[friend.x, friend.y, friend.is_found, friend.on_trail] 
+                             for friend in self.friends]
+        header["monsters"] = [[monster.x, monster.y, monster.direction, monster.patrol_type, 
+                               monster.is_stunned, monster.last_update] for monster in self.monsters]
+        header["mystery_machine"] = [self.mystery_machine.x, self.mystery_machine.y]
+        header["boss"] = [self.boss_monster.x, self.boss_monster.y] if self.boss_monster else None
+        
+        # Pending timers in firing order, as (due tick, owner, method, handle attribute);
+        # owner -1 is the player, anything else a monster index
+        header["timers"] = []
+        for timer in self.timers.pending():
+            owner = timer.callback.__self__
+            handle = next((name for name in TIMER_HANDLES if getattr(owner, name, None) is timer), None)
+            header["timers"].append([timer.due, -1 if owner is self.player else self.monsters.index(owner), 
+                                     timer.callback.__name__, handle])
+            
+        # Random streams the game has drawn from; a scene that hasn't been built yet
+        # starts its streams fresh after loading, just as it would have without saving
+        header["rng"] = {}
+        names = ["forest", "spawn", "ai", "restart"]
+        if self.neighborhood:
+            names.append("neighborhood")
+        if self.highway:
+            names += ["highway", "render"]
+        for name in names:
+            version, state, gauss_next = self.rng.stream(name).getstate()
+            header["rng"][name] = [version, gauss_next]
+            snapshot.add_array("rng:" + name, "I", state)
+            
+        # Environments: a streaming forest regenerates from its seed, so only the
+        # collectibles already picked up are kept
+        forest = self.forest
+        if forest.bounded:
+            header["forest"] = {"width": forest.width, "height": forest.height}
+            snapshot.add_array("trees", "i", chain.from_iterable((tree.x, tree.y) for tree in forest.trees))
+            snapshot.add_array("collectibles", "i", chain.from_iterable(
+                (collectible.x, collectible.y, COLLECTIBLE_TYPES.index(collectible.type)) 
+                for collectible in forest.collectibles))
+        else:
+            header["forest"] = {"seed": forest.seed, "max_chunks": forest.max_chunks, 
+                                "level": forest.level.path if forest.level else None}
+            snapshot.add_array("collected", "i", chain.from_iterable(
+                (chunk_x, chunk_y, index) for (chunk_x, chunk_y), indexes in forest.collected.items() 
+                for index in sorted(indexes)))
                 
-                # Check if position is valid (not colliding with trees)
-                valid_position = True
-                friend_rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-                for tree in self.forest.trees:
-                    if friend_rect.colliderect(tree):
-                        valid_position = False
-                        break
-                        
-                if valid_position:
-                    friends.append(Friend(x, y, image, name))
-                    break
+        header["neighborhood"] = None
+        if isinstance(self.neighborhood, LevelNeighborhood):
+            header["neighborhood"] = {"level": True}  # Read back from the level file
+        elif self.neighborhood:
+            header["neighborhood"] = {"exit": list(self.neighborhood.exit_position)}
+            snapshot.add_array("roads", "B", self.neighborhood.road_map)
+            snapshot.add_array("houses", "i", chain.from_iterable(self.neighborhood.house_positions))
+            snapshot.add_array("street_lights", "i", chain.from_iterable(self.neighborhood.street_lights))
+            
+        header["highway"] = None
+        if self.highway:
+            header["highway"] = {"length": self.highway.length}
+            snapshot.add_array("obstacles", "i", chain.from_iterable(self.highway.obstacles))
+            
+        snapshot.write(path)
+        
+    def load(self, path):
+        # Resume a saved game exactly where it was left: the world comes straight from
+        # the file instead of being generated
+        with SnapshotReader(path) as snapshot:
+            header = snapshot.header
+            self.infinite = header["infinite"]
+            self.rng = GameRNG(header["seed"])
+            self.seed = self.rng.seed
+            self.next_seed = header["next_seed"]
+            self.state = GameState(header["state"])
+            self.frame = header["frame"]
+            self.now = header["now"]
+            self.timers = TimerWheel()
+            self.timers.tick = header["tick"]
+            self.rewind = RewindBuffer()
+            self.input_bits = 0
+            self.score = header["score"]
+            self.time_elapsed = header["time_elapsed"]
+            self.traps_available = header["traps"]
+            self.answer_input = header["answer"]
+            self.all_friends_found = header["all_friends_found"]
+            self.transition_ready = header["transition_ready"]
+            self.game_over_reason = header["game_over_reason"]
+            self.camera_x, self.camera_y = header["camera"]
+            (self.highway_position, self.highway_lane, self.driving_speed, self.is_turning, 
+             self.turn_progress, self.turn_duration, self.turn_direction) = header["driving"]
+             
+            # Environments (a level game maps its level file again)
+            forest = header["forest"]
+            self.use_level(Level(forest["level"]) if forest.get("level") else None)
+            if "max_chunks" in forest:
+                collected = {}
+                for chunk_x, chunk_y, index in snapshot.rows("collected", 3):
+                    collected.setdefault((chunk_x, chunk_y), set()).add(index)
+                if self.level:
+                    self.forest = LevelForest(self.level, forest["max_chunks"], collected)
+                else:
+                    self.forest = StreamingForest(forest["seed"], self.forest_width, self.forest_height, 
+                                                  forest["max_chunks"], collected)
+            else:
+                self.forest = Forest(forest["width"], forest["height"], self.rng.stream("forest"), 
+                                     (snapshot.rows("trees", 2), snapshot.rows("collectibles", 3)))
+                                     
+            self.neighborhood = None
+            if header["neighborhood"] and header["neighborhood"].get("level"):
+                self.neighborhood = LevelNeighborhood(self.level, self.rng.stream("neighborhood"))
+            elif header["neighborhood"]:
+                self.neighborhood = Neighborhood(self.neighborhood_width, self.neighborhood_height, 
+                                                 self.rng.stream("neighborhood"), 
+                                                 (bytearray(snapshot.array("roads")), 
+                                                  list(snapshot.rows("houses", 2)), 
+                                                  list(snapshot.rows("street_lights", 2)), 
+                                                  tuple(header["neighborhood"]["exit"])))
+                                                  
+            self.highway = None
+            if header["highway"]:
+                self.highway = Highway(header["highway"]["length"], self.rng.stream("highway"), 
+                                       self.rng.stream("render"), 
+                                       [list(obstacle) for obstacle in snapshot.rows("obstacles", 2)])
+                                       
+            # Entities
+            x, y, courage, has_speed_boost, found, trail_head = header["player"]
+            self.player = Player(x, y)
+            self.player.courage = courage
+            self.player.has_speed_boost = has_speed_boost
+            self.player.trail.xs = array("d", snapshot.array("trail_x"))
+            self.player.trail.ys = array("d", snapshot.array("trail_y"))
+            self.player.trail.head = trail_head
+            
+            self.friends = self.create_friends([row[:2] for row in header["friends"]])
+            for friend, (_, _, is_found, on_trail) in zip(self.friends, header["friends"]):
+                friend.is_found = is_found
+                friend.on_trail = on_trail
+            self.player.found_friends = [self.friends[i] for i in found]
+            
+            # Monsters get the timer wheel after their timers are restored, so building
+            # them doesn't schedule fresh patrols
+            self.monsters = []
+            for x, y, direction, patrol_type, is_stunned, last_update in header["monsters"]:
+                monster = Monster(x, y, patrol_type, self.rng.stream("ai"))
+                monster.direction = direction
+                monster.is_stunned = is_stunned
+                monster.last_update = last_update
+                monster.timers = self.timers
+                self.monsters.append(monster)
+            self.monster_index = ProximityGrid(TILE_SIZE * 4)
+            self.monster_index.rebuild(self.monsters)
+            self.monster_phases = [self.monsters[phase::AI_COARSE_INTERVAL] for phase in range(AI_COARSE_INTERVAL)]
+            
+            self.mystery_machine = Character(*header["mystery_machine"], MYSTERY_MACHINE_IMG, 0)
+            self.boss_monster = BossMonster(*header["boss"]) if header["boss"] else None
+            
+            for due, owner, method, handle in header["timers"]:
+                entity = self.player if owner == -1 else self.monsters[owner]
+                timer = self.timers.schedule_at(due, getattr(entity, method))
+                if handle:
+                    setattr(entity, handle, timer)
+                    
+            # Random states last, since building the entities above draws from them
+            for name, (version, gauss_next) in header["rng"].items():
+                self.rng.stream(name).setstate((version, tuple(snapshot.array("rng:" + name)), gauss_next))
+                
+        self.snapshot()
+        self.prepare_ahead()
+        
+    def build_scene(self, name, builder, *args):
+        # The preloaded scene when there is one, otherwise build it now
+        if self.scene_preloader:
+            return self.scene_preloader.take(name, builder, *args)
+        return builder(*args)
+        
+    def create_friends(self, spawns):
+        friends = []
+        
+        # Place friends at the world's friend spawns (away from start position)
+        for (name, image), (x, y) in zip(FRIEND_DATA, spawns):
+            friends.append(Friend(x, y, image, name))
                     
         return friends
         
-    def create_monsters(self):
+    def create_monsters(self, spawns):
         monsters = []
         
         # Create different types of monsters
-        num_monsters = 5
-        for i in range(num_monsters):
-            while True:
-                x = random.randint(TILE_SIZE * 5, self.forest_width - TILE_SIZE * 3)
-                y = random.randint(TILE_SIZE * 5, self.forest_height - TILE_SIZE * 3)
-                
-                # Check if position is valid (not colliding with trees)
-                valid_position = True
-                monster_rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-                for tree in self.forest.trees:
-                    if monster_rect.colliderect(tree):
-                        valid_position = False
-                        break
-                        
-                # Also check distance from player start position
-                dx = x - (TILE_SIZE * 2)
-                dy = y - (TILE_SIZE * 2)
-                distance = math.sqrt(dx**2 + dy**2)
-                if distance < TILE_SIZE * 5:
-                    valid_position = False
-                
-                if valid_position:
-                    # Different patrol types
-                    patrol_type = "random" if i < 3 else "chase"
-                    monsters.append(Monster(x, y, patrol_type))
-                    break
+        for i, (x, y) in enumerate(spawns):
+            # Different patrol types
+            patrol_type = "random" if i < len(spawns) - 2 else "chase"
+            monsters.append(Monster(x, y, patrol_type, self.rng.stream("ai"), self.timers))
                     
         return monsters
     
     def initialize_neighborhood(self):
         # Create the suburban neighborhood
-        self.neighborhood = Neighborhood(self.neighborhood_width, self.neighborhood_height)
+        builder, args = self.neighborhood_scene()
+        self.neighborhood = self.build_scene("neighborhood", builder, *args)
         
         # Position the Mystery Machine in a suitable location
-        # Find a road near the "forest entrance" (left side of neighborhood)
-        for y in range(self.neighborhood_height // TILE_SIZE):
-            if self.neighborhood.is_road(TILE_SIZE * 5, y * TILE_SIZE):
-                # Place Mystery Machine on this road
-                self.mystery_machine = Character(TILE_SIZE * 5, y * TILE_SIZE, MYSTERY_MACHINE_IMG, 0)
-                # Position player and friends nearby
-                self.player.x = TILE_SIZE * 3
-                self.player.y = y * TILE_SIZE
-                
-                # Reset friend positions to follow behind player
-                for i, friend in enumerate(self.player.found_friends):
-                    friend.x = TILE_SIZE * (2 - i)
-                    friend.y = y * TILE_SIZE
+        # Find a road near the "forest entrance" (left side of neighborhood): the first road
+        # tile down column 5, found in one strided column slice of the road map
+        cols = self.neighborhood.cols
+        y = bytes(self.neighborhood.road_map[5::cols]).find(1) if cols > 5 else -1
+        if y != -1:
+            # Place Mystery Machine on this road
+            self.mystery_machine = Character(TILE_SIZE * 5, y * TILE_SIZE, MYSTERY_MACHINE_IMG, 0)
+            # Position player and friends nearby
+            self.player.x = TILE_SIZE * 3
+            self.player.y = y * TILE_SIZE
+            
+            # Reset friend positions to follow behind player (lined up to the left)
+            self.player.trail.reset(self.player.x, self.player.y)
+            for i, friend in enumerate(self.player.found_friends):
+                friend.on_trail = True
+                friend.follow(self.player.trail, i)
                 
-                break
+        # The boss comes out of the forest behind the gang and chases them along the roads
+        self.boss_monster = BossMonster(-TILE_SIZE * 2, self.player.y)
     
     def initialize_driving_mode(self):
         # Start the chase sequence
@@ -1385,7 +3064,8 @@ class Game:
         self.boss_monster = BossMonster(monster_x, monster_y)
         
         # Create highway for escape
-        self.highway = Highway(TILE_SIZE * 200)  # Length of 200 tiles
+        self.highway = self.build_scene("highway", Highway, TILE_SIZE * 200,  # Length of 200 tiles
+                                        self.rng.stream("highway"), self.rng.stream("render"))
         self.highway_position = 0
         self.highway_lane = 2  # Middle lane
         
@@ -1420,16 +3100,17 @@ class Game:
                 # In neighborhood
                 self.camera_x = max(0, min(self.camera_x, self.neighborhood_width - SCREEN_WIDTH))
                 self.camera_y = max(0, min(self.camera_y, self.neighborhood_height - SCREEN_HEIGHT))
-            else:
+            elif self.forest.edges:
                 # In forest
-                self.camera_x = max(0, min(self.camera_x, self.forest_width - SCREEN_WIDTH))
-                self.camera_y = max(0, min(self.camera_y, self.forest_height - SCREEN_HEIGHT))
+                edge_x, edge_y = self.forest.edges
+                self.camera_x = max(0, min(self.camera_x, edge_x - SCREEN_WIDTH))
+                self.camera_y = max(0, min(self.camera_y, edge_y - SCREEN_HEIGHT))
         
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events):
+        # Returns False once the player asks to quit
+        for event in events:
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                return False
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     if self.state == GameState.PLAYING or self.state == GameState.DRIVING:
@@ -1437,14 +3118,14 @@ class Game:
                     elif self.state == GameState.PAUSED:
                         self.state = GameState.PLAYING if self.all_friends_found and self.transition_ready else GameState.PLAYING
                     else:
-                        pygame.quit()
-                        sys.exit()
+                        return False
                 # Start game from menu
                 if self.state == GameState.MENU and event.key == pygame.K_RETURN:
                     self.state = GameState.PLAYING
                 # Restart after game over or win
                 if (self.state == GameState.GAME_OVER or self.state == GameState.WIN) and event.key == pygame.K_r:
-                    self.__init__()  # Reset game
+                    # Reset game (the next seed comes from this one, so whole sessions replay)
+                    self.reset(self.next_seed)
                 # Use trap if available
                 if self.state == GameState.PLAYING and event.key == pygame.K_SPACE:
                     self.use_trap()
@@ -1460,34 +3141,83 @@ class Game:
                         self.answer_input = ""  # Reset input after Enter
                     elif event.unicode.isalnum():  # Only alphanumeric characters
                         self.answer_input += event.unicode
+        return True
                     
     def use_trap(self):
         if self.traps_available <= 0:
             return
             
-        # Find the nearest monster
-        nearest_monster = None
-        nearest_distance = float('inf')
-        
-        for monster in self.monsters:
-            if not monster.is_stunned:  # Only target active monsters
-                dx = monster.x - self.player.x
-                dy = monster.y - self.player.y
-                distance = math.sqrt(dx**2 + dy**2)
-                
-                if distance < nearest_distance and distance < TILE_SIZE * 3:  # Trap range
-                    nearest_monster = monster
-                    nearest_distance = distance
+        # Find the nearest active monster within trap range
+        nearest_monster, _ = self.monster_index.nearest(self.player.x, self.player.y, 
+                                                        TRAP_RANGE, is_active_monster)
                     
         if nearest_monster:
             nearest_monster.stun()
             self.traps_available -= 1
             TRAP_SOUND.play()
                     
-    def update(self):
+    def tick(self, events, input_bits):
+        # Advance the game by one fixed step from this tick's input alone (no wall clock,
+        # no live key state), so recorded sessions replay exactly
+        self.snapshot()
+        scene = self.scene()
+        running = self.handle_events(events)
+        self.input_bits = input_bits
+        
+        # Holding rewind steps back through the buffered ticks instead of playing on
+        rewinding = self.state == GameState.PLAYING and input_bits & INPUT_REWIND
+        if rewinding:
+            self.rewind.step_back(self)
+            
+        # Simulation time (and every timer) only moves while the game is being played
+        elif self.state == GameState.PLAYING or self.state == GameState.DRIVING:
+            self.frame += 1
+            previous = self.now
+            self.now = self.frame * 1000 // FPS
+            self.timers.advance()
+            self.update(self.now - previous)
+            self.update_camera()
+            if self.state == GameState.PLAYING:
+                self.rewind.capture(self)
+            
+        # Don't blend positions (or rewind) across a jump to another scene
+        if self.scene() != scene:
+            self.snapshot()
+            self.rewind.clear()
+        return running
+        
+    def scene(self):
+        return self.all_friends_found and self.transition_ready, self.boss_monster is None, self.highway is None
+        
+    def snapshot(self):
+        # Remember where everything was at the start of the tick for render interpolation
+        self.player.snapshot()
+        for friend in self.player.found_friends:
+            friend.snapshot()
+        for monster in self.monsters:
+            monster.snapshot()
+        if self.boss_monster:
+            self.boss_monster.snapshot()
+        self.prev_camera_x = self.camera_x
+        self.prev_camera_y = self.camera_y
+        self.prev_highway_position = self.highway_position
+        
+    def state_hash(self):
+        # Checksum of the simulation state, compared tick by tick during replay
+        values = array("d", [self.state.value, self.score, self.traps_available, self.now, 
+                             self.player.x, self.player.y, self.player.courage, 
+                             len(self.player.found_friends), self.highway_position, 
+                             self.highway_lane, self.driving_speed])
+        for monster in self.monsters:
+            values.extend((monster.x, monster.y, monster.is_stunned))
+        if self.boss_monster:
+            values.extend((self.boss_monster.x, self.boss_monster.y))
+        return zlib.crc32(self.answer_input.encode(), zlib.crc32(values.tobytes()))
+                    
+    def update(self, dt):
         if self.state == GameState.PLAYING:
             # Update game time
-            self.time_elapsed += self.clock.get_time()
+            self.time_elapsed += dt
             
             if self.all_friends_found and self.transition_ready:
                 # In neighborhood heading to Mystery Machine
@@ -1502,22 +3232,37 @@ class Game:
             
     def update_forest(self):
         # Handle player movement
-        keys = pygame.key.get_pressed()
+        keys = self.input_bits
         dx, dy = 0, 0
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if keys & INPUT_LEFT:
             dx = -1
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if keys & INPUT_RIGHT:
             dx = 1
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
+        if keys & INPUT_UP:
             dy = -1
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        if keys & INPUT_DOWN:
             dy = 1
             
         self.player.move(dx, dy, self.forest)
         
-        # Update monsters
-        for monster in self.monsters:
-            monster.update_monster(self.forest, self.player.x, self.player.y)
+        # Make sure the part of the forest on and around the screen is loaded
+        self.forest.stream_around(self.camera_x - CHUNK_SIZE, self.camera_y - CHUNK_SIZE, 
+                                  self.camera_x + SCREEN_WIDTH + CHUNK_SIZE, 
+                                  self.camera_y + SCREEN_HEIGHT + CHUNK_SIZE)
+        
+        # Refresh the chase field around the player's new position
+        self.forest.nav_field.update(self.player.x, self.player.y)
+        
+        # Update the monsters due to think this tick (the chase-range check is one radius
+        # query around the player)
+        in_chase_range = set(self.monster_index.within(self.player.x, self.player.y, MONSTER_CHASE_RANGE))
+        for monster in self.monster_updates():
+            # Simulate every tick since its last update, so thinking less often doesn't
+            # change how far it gets
+            steps = self.frame - monster.last_update
+            monster.last_update = self.frame
+            monster.update_monster(self.forest, self.player.x, self.player.y, monster in in_chase_range, steps)
+            self.monster_index.update(monster)
             
             # Check collision with player
             if monster.collides_with(self.player) and not monster.is_stunned and not self.player.has_speed_boost:
@@ -1527,33 +3272,29 @@ class Game:
                 LOSE_SOUND.play()
                 
         # Update courage level based on monsters
-        if self.player.update_courage(self.monsters):
+        if self.player.update_courage(self.monster_index):
             self.state = GameState.GAME_OVER
             self.game_over_reason = "Scooby ran out of courage!"
             LOSE_SOUND.play()
                 
-        # Check collision with collectibles
-        for collectible in self.forest.collectibles[:]:
-            collectible_rect = pygame.Rect(collectible.x, collectible.y, 
-                                          collectible.width, collectible.height)
-            if self.player.rect.colliderect(collectible_rect):
-                if collectible.type == "snack":
-                    self.player.activate_speed_boost()
-                    self.score += 50
-                    SNACK_SOUND.play()
-                elif collectible.type == "trap":
-                    self.traps_available += 1
-                    self.score += 30
-                    COLLECT_SOUND.play()
-                    
-                self.forest.collectibles.remove(collectible)
+        # Check collision with collectibles (only the ones in the player's neighboring cells)
+        for collectible in self.forest.collectibles.touching(self.player.rect):
+            if collectible.type == "snack":
+                self.player.activate_speed_boost(self.timers)
+                self.score += 50
+                SNACK_SOUND.play()
+            elif collectible.type == "trap":
+                self.traps_available += 1
+                self.score += 30
+                COLLECT_SOUND.play()
+                
+            self.forest.remove_collectible(collectible)
+            self.rewind.picked_up(collectible)
         
-        # Update friend positions (follow the player)
-        previous_x, previous_y = self.player.x, self.player.y
-        for friend in self.player.found_friends:
-            current_x, current_y = friend.x, friend.y
-            friend.follow(previous_x, previous_y, self.forest)
-            previous_x, previous_y = current_x, current_y
+        # Update friend positions (follow the player's trail)
+        self.player.trail.record(self.player.x, self.player.y)
+        for i, friend in enumerate(self.player.found_friends):
+            friend.follow(self.player.trail, i)
             
         # Check collision with friends (to find them)
         for friend in self.friends:
@@ -1573,17 +3314,35 @@ class Game:
             self.transition_ready = True
             self.initialize_neighborhood()
             
+    def monster_updates(self):
+        # AI level of detail, the monsters due to think this tick: those near Scooby or on
+        # screen every tick and those within AI_FAR_RANGE every AI_FAR_INTERVAL ticks, all
+        # found with radius queries, plus one of AI_COARSE_INTERVAL phases of the whole list
+        # (so none waits longer than that). Only the nearby monsters and one phase are
+        # looked at, never the whole list
+        near = self.monster_index.within(self.player.x, self.player.y, AI_NEAR_RANGE)
+        near += self.monster_index.within(self.camera_x + SCREEN_WIDTH / 2, self.camera_y + SCREEN_HEIGHT / 2, 
+                                          AI_SCREEN_RANGE)
+        updates = dict.fromkeys(near)  # In query order, without repeats
+        
+        due = self.frame - AI_FAR_INTERVAL
+        for monster in self.monster_index.within(self.player.x, self.player.y, AI_FAR_RANGE):
+            if monster.last_update <= due:
+                updates[monster] = None
+        updates.update(dict.fromkeys(self.monster_phases[self.frame % AI_COARSE_INTERVAL]))
+        return updates
+        
     def update_neighborhood(self):
         # Handle player movement (still controlling Scooby)
-        keys = pygame.key.get_pressed()
+        keys = self.input_bits
         dx, dy = 0, 0
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if keys & INPUT_LEFT:
             dx = -1
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if keys & INPUT_RIGHT:
             dx = 1
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
+        if keys & INPUT_UP:
             dy = -1
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        if keys & INPUT_DOWN:
             dy = 1
             
         # Move towards Mystery Machine
@@ -1601,43 +3360,22 @@ class Game:
                 self.player.x = new_x
             if self.neighborhood.is_road(self.player.x + self.player.width//2, new_y + self.player.height//2):
                 self.player.y = new_y
-                
-        # Update player rectangle
-        self.player.rect.x = self.player.x
-        self.player.rect.y = self.player.y
         
-        # Update friend positions (follow the player)
-        previous_x, previous_y = self.player.x, self.player.y
-        for friend in self.player.found_friends:
-            current_x, current_y = friend.x, friend.y
-            # Simplified following in neighborhood
-            dx = previous_x - friend.x
-            dy = previous_y - friend.y
-            dist = math.sqrt(dx*dx + dy*dy)
-            
-            if dist > friend.follow_distance:
-                if dist > 0:
-                    dx /= dist
-                    dy /= dist
-                    
-                new_x = friend.x + dx * friend.speed
-                new_y = friend.y + dy * friend.speed
-                
-                # Try to keep on roads
-                if self.neighborhood.is_road(new_x + friend.width//2, new_y + friend.height//2):
-                    friend.x = new_x
-                    friend.y = new_y
-                else:
-                    # Try each direction separately
-                    if self.neighborhood.is_road(new_x + friend.width//2, friend.y + friend.height//2):
-                        friend.x = new_x
-                    if self.neighborhood.is_road(friend.x + friend.width//2, new_y + friend.height//2):
-                        friend.y = new_y
-                        
-            friend.rect.x = friend.x
-            friend.rect.y = friend.y
+        # Update friend positions (follow the player's trail)
+        self.player.trail.record(self.player.x, self.player.y)
+        for i, friend in enumerate(self.player.found_friends):
+            friend.follow(self.player.trail, i)
             
-            previous_x, previous_y = current_x, current_y
+        # The boss follows the road flow field toward Scooby
+        if self.boss_monster:
+            self.boss_monster.update(self.player.x + self.player.width//2, 
+                                     self.player.y + self.player.height//2, self.neighborhood)
+            if self.boss_monster.collides_with(self.player) and not self.player.has_speed_boost:
+                self.state = GameState.GAME_OVER
+                self.game_over_reason = "Scooby was caught by the boss monster!"
+                MONSTER_SOUND.play()
+                LOSE_SOUND.play()
+                return
             
         # Check if player has reached the Mystery Machine
         if self.player.collides_with(self.mystery_machine):
@@ -1653,27 +3391,27 @@ class Game:
             self.initialize_highway_escape()
             
     def update_driving(self):
-        keys = pygame.key.get_pressed()
+        keys = self.input_bits
         
         if not self.is_turning:
             # Normal driving (forward movement)
             self.highway_position += self.driving_speed
             
             # Lane changes
-            if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+            if keys & INPUT_LEFT:
                 if self.highway_lane > 0:
                     self.is_turning = True
                     self.turn_progress = 0
                     self.turn_direction = -1  # Left
-            elif keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+            elif keys & INPUT_RIGHT:
                 if self.highway_lane < 4:
                     self.is_turning = True
                     self.turn_progress = 0
                     self.turn_direction = 1  # Right
             # Speed control
-            if keys[pygame.K_UP] or keys[pygame.K_w]:
+            if keys & INPUT_UP:
                 self.driving_speed = min(10, self.driving_speed + 0.1)  # Accelerate
-            elif keys[pygame.K_DOWN] or keys[pygame.K_s]:
+            elif keys & INPUT_DOWN:
                 self.driving_speed = max(3, self.driving_speed - 0.1)  # Brake
         else:
             # In the middle of a lane change
@@ -1696,43 +3434,47 @@ class Game:
             # Removed original collision check and game-over condition
             # Removed win condition based on self.highway_position >= self.highway.length
         
-    def draw(self):
+    def draw(self, alpha=1.0):
+        # alpha is how far we are between the previous tick and the current one
+        camera_x = self.prev_camera_x + (self.camera_x - self.prev_camera_x) * alpha
+        camera_y = self.prev_camera_y + (self.camera_y - self.prev_camera_y) * alpha
+        
         if self.state == GameState.PLAYING:
             if self.all_friends_found and self.transition_ready:
                 # Draw neighborhood
-                self.neighborhood.draw(screen, self.camera_x, self.camera_y)
+                self.neighborhood.draw(screen, camera_x, camera_y)
             else:
                 # Draw forest
-                self.forest.draw(screen, self.camera_x, self.camera_y)
+                self.forest.draw(screen, camera_x, camera_y)
                 
             # Draw the Mystery Machine
-            self.mystery_machine.draw(screen, self.camera_x, self.camera_y)
+            self.mystery_machine.draw(screen, camera_x, camera_y)
             
             if not self.transition_ready:
-                # Draw collectibles (only in forest)
-                for collectible in self.forest.collectibles:
-                    collectible.draw(screen, self.camera_x, self.camera_y)
-                
                 # Draw friends that haven't been found yet
                 for friend in self.friends:
                     if not friend.is_found:
-                        friend.draw(screen, self.camera_x, self.camera_y)
+                        friend.draw(screen, camera_x, camera_y)
                         
                 # Draw monsters (only in forest)
                 for monster in self.monsters:
-                    monster.draw(screen, self.camera_x, self.camera_y)
+                    monster.draw(screen, camera_x, camera_y, alpha)
+            elif self.boss_monster:
+                # Draw the boss chasing through the neighborhood
+                self.boss_monster.draw(screen, camera_x, camera_y, alpha)
             
             # Draw player (Scooby)
-            self.player.draw(screen, self.camera_x, self.camera_y)
+            self.player.draw(screen, camera_x, camera_y, alpha)
             
             # Draw found friends following Scooby
             for friend in self.player.found_friends:
-                friend.draw(screen, self.camera_x, self.camera_y)
+                friend.draw(screen, camera_x, camera_y, alpha)
                 
         elif self.state == GameState.DRIVING:
             if self.highway:
                 # Draw highway escape sequence
-                self.highway.draw(screen, self.highway_position)
+                highway_position = self.prev_highway_position + (self.highway_position - self.prev_highway_position) * alpha
+                self.highway.draw(screen, highway_position)
                 
                 # Draw Mystery Machine on highway
                 vehicle_x = SCREEN_WIDTH // 3
@@ -1741,7 +3483,7 @@ class Game:
                 # Apply lane change animation
                 if self.is_turning:
                     # Calculate lane position during turn
-                    progress_ratio = self.turn_progress / self.turn_duration
+                    progress_ratio = max(0, self.turn_progress - 1 + alpha) / self.turn_duration
                     lane_offset = self.turn_direction * progress_ratio * TILE_SIZE
                     vehicle_y += lane_offset
                 
@@ -1755,17 +3497,17 @@ class Game:
                 
             else:
                 # Draw neighborhood chase sequence
-                self.neighborhood.draw(screen, self.camera_x, self.camera_y)
+                self.neighborhood.draw(screen, camera_x, camera_y)
                 
                 # Draw Mystery Machine
-                self.mystery_machine.draw(screen, self.camera_x, self.camera_y)
+                self.mystery_machine.draw(screen, camera_x, camera_y)
                 
                 # Draw player (Scooby) - now driving Mystery Machine
-                self.player.draw(screen, self.camera_x, self.camera_y)
+                self.player.draw(screen, camera_x, camera_y, alpha)
                 
                 # Draw boss monster chasing
                 if self.boss_monster:
-                    self.boss_monster.draw(screen, self.camera_x, self.camera_y)
+                    self.boss_monster.draw(screen, camera_x, camera_y, alpha)
             
         # Draw UI elements (score, time, etc.)
         self.draw_ui()
@@ -1883,12 +3625,13 @@ class Game:
         overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
         overlay.fill((0, 0, 100, 100))  # Semi-transparent blue
         
-        # Add stars and confetti
+        # Add stars and confetti (from the render stream, so simulation randomness is untouched)
+        render_rng = self.rng.stream("render")
         for _ in range(50):
-            x = random.randint(0, SCREEN_WIDTH)
-            y = random.randint(0, SCREEN_HEIGHT)
-            size = random.randint(2, 8)
-            color = random.choice([
+            x = render_rng.randint(0, SCREEN_WIDTH)
+            y = render_rng.randint(0, SCREEN_HEIGHT)
+            size = render_rng.randint(2, 8)
+            color = render_rng.choice([
                 (255, 255, 0),  # Yellow
                 (255, 0, 255),  # Magenta
                 (0, 255, 255),  # Cyan
@@ -1897,7 +3640,7 @@ class Game:
             ])
             
             # Draw either star or confetti
-            if random.random() < 0.5:
+            if render_rng.random() < 0.5:
                 # Star
                 points = []
                 for i in range(5):
@@ -2199,31 +3942,715 @@ class Game:
             screen.blit(input_text, (10, 80))
 
     
-    def run(self):
-        # Main game loop
-        while True:
-            self.handle_events()
-            
-            if self.state == GameState.PLAYING or self.state == GameState.DRIVING:
-                self.update()
-                self.update_camera()
-                self.draw()
-            elif self.state == GameState.MENU:
-                self.draw_menu()
-            elif self.state == GameState.GAME_OVER:
-                self.draw_game_over()
-            elif self.state == GameState.WIN:
-                self.draw_win()
-            elif self.state == GameState.PAUSED:
-                self.draw()
-                self.draw_pause()
+    def render(self, alpha=1.0):
+        if self.state == GameState.PLAYING or self.state == GameState.DRIVING:
+            self.draw(alpha)
+        elif self.state == GameState.MENU:
+            self.draw_menu()
+        elif self.state == GameState.GAME_OVER:
+            self.draw_game_over()
+        elif self.state == GameState.WIN:
+            self.draw_win()
+        elif self.state == GameState.PAUSED:
+            self.draw()
+            self.draw_pause()
+    
+    def run(self, recorder=None, capture=None):
+        # Main game loop: the simulation runs in fixed ticks, catching up when a frame
+        # was slow, and drawing blends between the last two ticks
+        accumulator = 0
+        events = []
+        running = True
+        try:
+            while running:
+                accumulator += min(self.clock.tick(MAX_RENDER_FPS), MAX_FRAME_TIME)
+                for event in pygame.event.get():
+                    # Quick save and load run between ticks and aren't recorded (a recording
+                    # replays from its seed, so it can't follow a load)
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                        self.save(QUICKSAVE_FILE)
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                        if not recorder and os.path.exists(QUICKSAVE_FILE):
+                            self.load(QUICKSAVE_FILE)
+                            events = []
+                    else:
+                        events.append(event)  # Held until the next tick runs
+                input_bits = pack_input(pygame.key.get_pressed())
+                
+                ticked = False
+                while accumulator >= TICK_TIME and running:
+                    running = self.tick(events, input_bits)
+                    if recorder:
+                        recorder.record(events, input_bits, self.state_hash())
+                    events = []
+                    accumulator -= TICK_TIME
+                    ticked = True
+                    
+                if running:
+                    self.render(accumulator / TICK_TIME)
+                    if capture and ticked:
+                        # One captured frame per simulated step, so videos play at FPS
+                        capture.capture()
+                    pygame.display.flip()
+        finally:
+            if recorder:
+                recorder.close()
+            if capture:
+                capture.close()
+        pygame.quit()
+        sys.exit()
+
+
+
+# Balance bot class (base for scripted players used by the batch simulator)
+class BalanceBot:
+    MOVES = (0, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN, INPUT_LEFT | INPUT_UP, 
+             INPUT_LEFT | INPUT_DOWN, INPUT_RIGHT | INPUT_UP, INPUT_RIGHT | INPUT_DOWN)
+    RIDDLE_KEYS = ((pygame.K_n, "n"), (pygame.K_o, "o"), (pygame.K_RETURN, "\r"))
+    
+    def __init__(self, rng):
+        self.rng = rng
+        self.typing = []  # Riddle keys still to press
+        
+    def act(self, game):
+        # Returns (events, input_bits) for the next tick
+        if game.state == GameState.DRIVING:
+            # Every bot knows the answer to the riddle
+            if not self.typing:
+                self.typing = list(self.RIDDLE_KEYS)
+            key, text = self.typing.pop(0)
+            return [pygame.event.Event(pygame.KEYDOWN, key=key, unicode=text)], 0
+        return self.steer(game)
+        
+    def steer(self, game):
+        return [], 0
+
+# Random walk bot class (holds a random direction for a while, then picks another)
+class RandomWalkBot(BalanceBot):
+    def __init__(self, rng):
+        super().__init__(rng)
+        self.input_bits = 0
+        self.hold = 0
+        
+    def steer(self, game):
+        if self.hold <= 0:
+            self.input_bits = self.rng.choice(self.MOVES)
+            self.hold = self.rng.randint(15, 60)
+        self.hold -= 1
+        return [], self.input_bits
+
+# Seek bot class (walks to the nearest missing friend, then the Mystery Machine, and
+# traps monsters that get close)
+class SeekBot(RandomWalkBot):
+    def __init__(self, rng):
+        super().__init__(rng)
+        self.last_position = None
+        self.stuck_ticks = 0
+        
+    def steer(self, game):
+        player = game.player
+        events = []
+        if game.traps_available and game.monster_index.nearest(player.x, player.y, TRAP_RANGE, 
+                                                               is_active_monster)[0]:
+            events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, unicode=" "))
+            
+        # Blocked by a tree or off the road: wander randomly for a bit
+        if (player.x, player.y) == self.last_position:
+            self.stuck_ticks += 1
+        else:
+            self.stuck_ticks = 0
+        self.last_position = (player.x, player.y)
+        if self.stuck_ticks > 5:
+            self.hold = self.rng.randint(15, 45)
+            self.input_bits = self.rng.choice(self.MOVES[1:])
+            self.stuck_ticks = 0
+        if self.hold > 0:
+            self.hold -= 1
+            return events, self.input_bits
+            
+        if game.all_friends_found:
+            target = game.mystery_machine
+        else:
+            target = min((friend for friend in game.friends if not friend.is_found), 
+                         key=lambda friend: (friend.x - player.x)**2 + (friend.y - player.y)**2)
+        input_bits = 0
+        if target.x < player.x - player.speed:
+            input_bits |= INPUT_LEFT
+        elif target.x > player.x + player.speed:
+            input_bits |= INPUT_RIGHT
+        if target.y < player.y - player.speed:
+            input_bits |= INPUT_UP
+        elif target.y > player.y + player.speed:
+            input_bits |= INPUT_DOWN
+        return events, input_bits
+
+BOT_POLICIES = {"random": RandomWalkBot, "seek": SeekBot}
+
+# Tunable constants a batch run can sweep, with their shipped values
+BALANCE_PARAMETERS = ("PLAYER_SPEED", "MONSTER_SPEED", "NUM_MONSTERS", "TRAP_RANGE", 
+                      "COURAGE_DRAIN_NEAR", "COURAGE_DRAIN_FAR", "COURAGE_RECOVERY")
+BALANCE_DEFAULTS = {name: globals()[name] for name in BALANCE_PARAMETERS}
+
+def headless_context():
+    # Worker processes start as fresh interpreters (not forked copies of this one's
+    # pygame state), with no window or audio
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    return multiprocessing.get_context("spawn")
+
+def play_balance_game(job):
+    # Runs in a worker process: one complete headless game with the job's overrides
+    policy, seed, overrides, max_ticks = job
+    globals().update(BALANCE_DEFAULTS)
+    globals().update(overrides)
+    
+    game = Game(seed=seed)
+    bot = BOT_POLICIES[policy](random.Random(seed))
+    game.tick([pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN, unicode="\r")], 0)
+    friends_tick = None
+    while game.frame < max_ticks and (game.state == GameState.PLAYING or game.state == GameState.DRIVING):
+        events, input_bits = bot.act(game)
+        game.tick(events, input_bits)
+        if friends_tick is None and game.all_friends_found:
+            friends_tick = game.frame
+            
+    if game.state == GameState.WIN:
+        outcome = "win"
+    elif game.state == GameState.GAME_OVER:
+        outcome = "caught" if "caught" in game.game_over_reason else "courage"
+    else:
+        outcome = "timeout"
+    return {"policy": policy, "seed": seed, "params": overrides, "outcome": outcome, 
+            "ticks": game.frame, "friends_tick": friends_tick, "score": game.score, 
+            "friends_found": len(game.player.found_friends)}
+
+# Balance report class (aggregates batch results per parameter set as they arrive)
+class BalanceReport:
+    def __init__(self):
+        self.rows = {}  # parameter key -> [games, outcome counter, friends ticks]
+        
+    def add(self, result):
+        key = ", ".join(f"{name}={value}" for name, value in sorted(result["params"].items())) or "defaults"
+        row = self.rows.setdefault(key, [0, Counter(), []])
+        row[0] += 1
+        row[1][result["outcome"]] += 1
+        if result["friends_tick"] is not None:
+            row[2].append(result["friends_tick"])
+            
+    def lines(self):
+        yield f"{'parameters':40} {'games':>6} {'win':>6} {'caught':>7} {'courage':>8} {'timeout':>8} {'friends in':>11}"
+        for key, (games, outcomes, friends_ticks) in self.rows.items():
+            rates = [f"{100 * outcomes[outcome] / games:.0f}%" for outcome in ("win", "caught", "courage", "timeout")]
+            friends = f"{sum(friends_ticks) / len(friends_ticks) / FPS:.1f}s" if friends_ticks else "-"
+            yield f"{key:40} {games:>6} {rates[0]:>6} {rates[1]:>7} {rates[2]:>8} {rates[3]:>8} {friends:>11}"
+
+def parse_sweeps(sweeps):
+    # ["MONSTER_SPEED=1.5,2", "NUM_MONSTERS=5,8"] -> one override dict per combination
+    axes = []
+    for sweep in sweeps:
+        name, _, values = sweep.partition("=")
+        if name not in BALANCE_DEFAULTS:
+            raise ValueError(f"can't sweep {name}; choose from {', '.join(BALANCE_PARAMETERS)}")
+        axis = []
+        for text in values.split(","):
+            value = float(text)
+            if isinstance(BALANCE_DEFAULTS[name], int) and value.is_integer():
+                value = int(value)
+            axis.append((name, value))
+        axes.append(axis)
+    return [dict(combination) for combination in product(*axes)]
+
+def run_batch(games, policy, sweeps, seed, max_ticks, workers, report_path=None):
+    jobs = [(policy, seed + i, overrides, max_ticks) 
+            for overrides in parse_sweeps(sweeps) for i in range(games)]
+    report = BalanceReport()
+    report_file = open(report_path, "w") if report_path else None
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=headless_context()) as executor:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+        for done, result in enumerate(executor.map(play_balance_game, jobs, chunksize=chunksize), 1):
+            report.add(result)
+            if report_file:
+                report_file.write(json.dumps(result) + "\n")
+            if done % 100 == 0 or done == len(jobs):
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(jobs)} games, {done / elapsed:.1f} games/s", flush=True)
+    if report_file:
+        report_file.close()
+    return report
+
+def measure_entity_memory(count=100000):
+    # Bytes allocated per entity (positions included, shared images not) for large
+    # hordes and collectible-heavy worlds
+    rng = random.Random(0)
+    makers = [("Monster", lambda x, y: Monster(x, y, "random", rng)), 
+              ("Friend", lambda x, y: Friend(x, y, SHAGGY_IMG, "Shaggy")), 
+              ("Collectible", lambda x, y: Collectible(x, y, SCOOBY_SNACK_IMG, "snack"))]
+    results = []
+    for name, make in makers:
+        positions = [(rng.uniform(0, 10000), rng.uniform(0, 10000)) for _ in range(count)]
+        tracemalloc.start()
+        entities = [make(x, y) for x, y in positions]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append((name, size / count))
+        del entities
+    return results
+
+# Environment actions: the nine movement choices, then trap and riddle answer
+ENV_ACTIONS = len(BalanceBot.MOVES) + 2
+ACTION_TRAP = len(BalanceBot.MOVES)
+ACTION_ANSWER = len(BalanceBot.MOVES) + 1
+ENV_NEAREST_MONSTERS = 5  # Monsters described in each observation, nearest first
+OBS_SIZE = 15 + 3 * ENV_NEAREST_MONSTERS
+
+# Game environment class (reset/step interface for agents, one Game per environment)
+class GameEnv:
+    def __init__(self, max_ticks=FPS * 60 * 5, frame_skip=1, obs=None, grid_radius=None):
+        self.max_ticks = max_ticks
+        self.frame_skip = frame_skip  # Ticks each action is held for
+        self.grid_radius = grid_radius  # Also keep an ObservationGrid of this radius (needs NumPy)
+        self.grid = None
+        # Observation buffer: a float memoryview (possibly shared memory) or our own array
+        self.obs = obs if obs is not None else array("f", bytes(4 * OBS_SIZE))
+        self.game = None
+        self.seed = None
+        
+    def reset(self, seed=None):
+        self.seed = seed
+        self.game = Game(seed=seed)
+        self.game.tick([pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN, unicode="\r")], 0)
+        if self.grid_radius:
+            self.grid = ObservationGrid(self.game, self.grid_radius)
+        self.observe()
+        return self.obs
+        
+    def step(self, action):
+        # Returns (observation, reward, done, info)
+        game = self.game
+        score = game.score
+        if action == ACTION_TRAP:
+            events = [pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, unicode=" ")]
+            input_bits = 0
+        elif action == ACTION_ANSWER:
+            events = [pygame.event.Event(pygame.KEYDOWN, key=key, unicode=text) 
+                      for key, text in BalanceBot.RIDDLE_KEYS]
+            input_bits = 0
+        else:
+            events = []
+            input_bits = BalanceBot.MOVES[action]
+            
+        for _ in range(self.frame_skip):
+            game.tick(events, input_bits)
+            events = []
+            if game.state != GameState.PLAYING and game.state != GameState.DRIVING:
+                break
+                
+        # Points earned, a small cost per tick, and a penalty for losing
+        reward = (game.score - score) / 100 - 0.001 * self.frame_skip
+        info = {"state": game.state.name}
+        done = False
+        if game.state == GameState.GAME_OVER:
+            reward -= 10
+            done = True
+            info["outcome"] = "caught" if "caught" in game.game_over_reason else "courage"
+        elif game.state == GameState.WIN:
+            done = True
+            info["outcome"] = "win"
+        elif game.frame >= self.max_ticks:
+            done = True
+            info["outcome"] = "timeout"
+        self.observe()
+        return self.obs, reward, done, info
+        
+    def observe(self):
+        # Fixed-size float vector, positions relative to Scooby and scaled to about -1..1
+        game = self.game
+        player = game.player
+        obs = self.obs
+        driving = game.state == GameState.DRIVING
+        in_neighborhood = game.all_friends_found and game.transition_ready
+        obs[0] = not driving and not in_neighborhood
+        obs[1] = not driving and in_neighborhood
+        obs[2] = driving
+        obs[3] = player.x / game.forest_width
+        obs[4] = player.y / game.forest_height
+        obs[5] = player.courage / 100
+        obs[6] = player.has_speed_boost
+        obs[7] = game.traps_available / 5
+        obs[8] = len(player.found_friends) / len(game.friends)
+        
+        # Where to go next: the nearest missing friend, or the Mystery Machine
+        target = game.mystery_machine
+        if not game.all_friends_found:
+            target = min((friend for friend in game.friends if not friend.is_found), 
+                         key=lambda friend: (friend.x - player.x)**2 + (friend.y - player.y)**2)
+        obs[9] = (target.x - player.x) / SCREEN_WIDTH
+        obs[10] = (target.y - player.y) / SCREEN_HEIGHT
+        
+        # Driving phase
+        obs[11] = game.highway_lane / 4
+        obs[12] = game.driving_speed / 10
+        boss = game.boss_monster
+        obs[13] = (boss.x - player.x) / SCREEN_WIDTH if boss else 0
+        obs[14] = (boss.y - player.y) / SCREEN_HEIGHT if boss else 0
+        
+        # Nearest monsters (zeros when there are fewer, or in later phases)
+        monsters = []
+        if not driving and not in_neighborhood:
+            monsters = sorted(game.monsters, key=lambda monster: (monster.x - player.x)**2 + (monster.y - player.y)**2)
+        index = 15
+        for i in range(ENV_NEAREST_MONSTERS):
+            if i < len(monsters):
+                monster = monsters[i]
+                obs[index] = (monster.x - player.x) / SCREEN_WIDTH
+                obs[index + 1] = (monster.y - player.y) / SCREEN_HEIGHT
+                obs[index + 2] = monster.is_stunned
+            else:
+                obs[index] = obs[index + 1] = obs[index + 2] = 0
+            index += 3
+            
+        if self.grid:
+            self.grid.update()
+
+# Observation grid channels (one tile per cell, centered on Scooby)
+GRID_TREES = 0
+GRID_MONSTERS = 1
+GRID_FRIENDS = 2
+GRID_SNACKS = 3
+GRID_TRAPS = 4
+GRID_ROAD = 5
+GRID_CHANNELS = 6
+
+# Observation grid class (multi-channel tile grid around Scooby, kept up to date
+# incrementally in one preallocated NumPy buffer)
+class ObservationGrid:
+    def __init__(self, game, radius=8):
+        if np is None:
+            raise ImportError("ObservationGrid needs NumPy")
+        self.game = game
+        self.radius = radius
+        self.size = radius * 2 + 1
+        self.cells = np.zeros((GRID_CHANNELS, self.size, self.size), dtype=np.uint8)
+        self.origin = None  # World tile at the grid's top-left corner
+        self.scene = None
+        self.collectibles_version = None
+        self.world_trees = None  # Tree tiles of a bounded forest, rasterized once
+        self.marked = []  # (channel, row, col) cells holding moving things
+        
+    def update(self):
+        game = self.game
+        player = game.player
+        in_forest = not (game.all_friends_found and game.transition_ready) and game.state != GameState.DRIVING
+        scene = game.scene() + (in_forest,)
+        if scene != self.scene:
+            self.scene = scene
+            self.origin = None
+            self.world_trees = None
+            self.cells.fill(0)
+            self.marked.clear()
+            if in_forest and game.forest.bounded:
+                self.world_trees = self.rasterize_world_trees(game.forest)
                 
-            pygame.display.flip()
-            self.clock.tick(60)  # 60 FPS
+        # The static channels only change when the grid slides to a new tile or a
+        # collectible is picked up
+        origin = (int((player.x + player.width / 2) // TILE_SIZE) - self.radius, 
+                  int((player.y + player.height / 2) // TILE_SIZE) - self.radius)
+        if origin != self.origin:
+            self.origin = origin
+            self.copy_terrain(in_forest)
+            self.collectibles_version = None
+        if in_forest and game.forest.collectibles.version != self.collectibles_version:
+            self.collectibles_version = game.forest.collectibles.version
+            self.rasterize_collectibles(game.forest)
+            
+        # Moving things: clear last tick's cells, then mark the current ones
+        cells = self.cells
+        for channel, row, col in self.marked:
+            cells[channel, row, col] = 0
+        self.marked.clear()
+        if in_forest:
+            for monster in game.monsters:
+                self.mark(GRID_MONSTERS, monster)
+            for friend in game.friends:
+                if not friend.is_found:
+                    self.mark(GRID_FRIENDS, friend)
+        elif game.boss_monster:
+            self.mark(GRID_MONSTERS, game.boss_monster)
+        return cells
+        
+    def mark(self, channel, entity):
+        row = int((entity.y + entity.height / 2) // TILE_SIZE) - self.origin[1]
+        col = int((entity.x + entity.width / 2) // TILE_SIZE) - self.origin[0]
+        if 0 <= row < self.size and 0 <= col < self.size:
+            self.cells[channel, row, col] += 1
+            self.marked.append((channel, row, col))
+            
+    def rasterize_world_trees(self, forest):
+        rows = -(-forest.height // TILE_SIZE)
+        cols = -(-forest.width // TILE_SIZE)
+        world = np.zeros((rows, cols), dtype=np.uint8)
+        for tree in forest.trees:
+            world[tree.y // TILE_SIZE:(tree.bottom - 1) // TILE_SIZE + 1, 
+                  tree.x // TILE_SIZE:(tree.right - 1) // TILE_SIZE + 1] = 1
+        return world
+        
+    def copy_window(self, channel, world, outside):
+        # Copy the part of a world raster under the grid; tiles past its edge get `outside`
+        grid = self.cells[channel]
+        grid.fill(outside)
+        left, top = self.origin
+        rows, cols = world.shape
+        top_clip, bottom_clip = max(top, 0), min(top + self.size, rows)
+        left_clip, right_clip = max(left, 0), min(left + self.size, cols)
+        if top_clip < bottom_clip and left_clip < right_clip:
+            grid[top_clip - top:bottom_clip - top, left_clip - left:right_clip - left] = \
+                world[top_clip:bottom_clip, left_clip:right_clip]
+                
+    def copy_terrain(self, in_forest):
+        game = self.game
+        self.cells[GRID_TREES].fill(0)
+        self.cells[GRID_ROAD].fill(0)
+        if in_forest and self.world_trees is not None:
+            # Past the forest's edge is as impassable as a tree
+            self.copy_window(GRID_TREES, self.world_trees, 1)
+        elif in_forest:
+            # Streaming forest: rasterize the trees of the chunks under the grid
+            left = self.origin[0] * TILE_SIZE
+            top = self.origin[1] * TILE_SIZE
+            right = left + self.size * TILE_SIZE
+            bottom = top + self.size * TILE_SIZE
+            grid = self.cells[GRID_TREES]
+            for chunk in game.forest.chunks_in(left - game.forest.overhang, top - game.forest.overhang, 
+                                               right, bottom):
+                for tree in chunk.trees:
+                    top_row = max(tree.y // TILE_SIZE - self.origin[1], 0)
+                    left_col = max(tree.x // TILE_SIZE - self.origin[0], 0)
+                    bottom_row = min((tree.bottom - 1) // TILE_SIZE - self.origin[1] + 1, self.size)
+                    right_col = min((tree.right - 1) // TILE_SIZE - self.origin[0] + 1, self.size)
+                    if top_row < bottom_row and left_col < right_col:
+                        grid[top_row:bottom_row, left_col:right_col] = 1
+        elif game.neighborhood:
+            neighborhood = game.neighborhood
+            roads = np.frombuffer(neighborhood.road_map, dtype=np.uint8).reshape(neighborhood.rows, neighborhood.cols)
+            self.copy_window(GRID_ROAD, roads, 0)
+            
+    def rasterize_collectibles(self, forest):
+        snacks = self.cells[GRID_SNACKS]
+        traps = self.cells[GRID_TRAPS]
+        snacks.fill(0)
+        traps.fill(0)
+        left = self.origin[0] * TILE_SIZE
+        top = self.origin[1] * TILE_SIZE
+        for collectible in forest.collectibles.query(left - TILE_SIZE, top - TILE_SIZE, 
+                                                     left + self.size * TILE_SIZE, top + self.size * TILE_SIZE):
+            row = int((collectible.y + collectible.height / 2) // TILE_SIZE) - self.origin[1]
+            col = int((collectible.x + collectible.width / 2) // TILE_SIZE) - self.origin[0]
+            if 0 <= row < self.size and 0 <= col < self.size:
+                channel = snacks if collectible.type == "snack" else traps
+                channel[row, col] += 1
 
+def step_and_reset(env, action, stride):
+    # Step one environment of a vector; a finished one restarts right away with the
+    # seed `stride` further on, so environments never replay each other's episodes
+    _, reward, done, info = env.step(action)
+    if done:
+        env.reset(None if env.seed is None else env.seed + stride)
+    return reward, done, info
 
+def vector_env_worker(connection, memory_name, first, count, stride, max_ticks, frame_skip):
+    # Runs in a subprocess: steps environments first..first+count, writing their
+    # observations straight into the shared buffer
+    memory = shared_memory.SharedMemory(name=memory_name)
+    buffer = memory.buf.cast("f")
+    envs = [GameEnv(max_ticks, frame_skip, buffer[(first + i) * OBS_SIZE:(first + i + 1) * OBS_SIZE]) 
+            for i in range(count)]
+    try:
+        while True:
+            command, argument = connection.recv()
+            if command == "reset":
+                for env, seed in zip(envs, argument):
+                    env.reset(seed)
+                connection.send(None)
+            elif command == "step":
+                connection.send([step_and_reset(env, action, stride) for env, action in zip(envs, argument)])
+            else:
+                break
+    finally:
+        for env in envs:
+            env.obs.release()
+        buffer.release()
+        memory.close()
+
+# Vector environment class (steps N GameEnvs in lockstep; observations live in one
+# float buffer, shared memory when the environments run in subprocesses)
+class VectorEnv:
+    def __init__(self, count, processes=0, max_ticks=FPS * 60 * 5, frame_skip=1):
+        self.count = count
+        self.memory = shared_memory.SharedMemory(create=True, size=4 * OBS_SIZE * count)
+        self.buffer = self.memory.buf.cast("f")
+        self.array = None if np is None else np.frombuffer(self.buffer, dtype=np.float32).reshape(count, OBS_SIZE)
+        self.envs = []
+        self.workers = []  # (process, connection, first, count)
+        
+        if processes:
+            context = headless_context()
+            per_worker = -(-count // processes)
+            for first in range(0, count, per_worker):
+                size = min(per_worker, count - first)
+                connection, child = context.Pipe()
+                process = context.Process(target=vector_env_worker, daemon=True, 
+                                          args=(child, self.memory.name, first, size, count, 
+                                                max_ticks, frame_skip))
+                process.start()
+                self.workers.append((process, connection, first, size))
+        else:
+            self.envs = [GameEnv(max_ticks, frame_skip, self.buffer[i * OBS_SIZE:(i + 1) * OBS_SIZE]) 
+                         for i in range(count)]
+            
+    @property
+    def observations(self):
+        # (count, OBS_SIZE) NumPy view when NumPy is installed, otherwise the flat buffer;
+        # either points into the env's memory, so drop it before close
+        return self.buffer if self.array is None else self.array
+        
+    def reset(self, seed=None):
+        seeds = [None if seed is None else seed + i for i in range(self.count)]
+        if self.workers:
+            for _, connection, first, size in self.workers:
+                connection.send(("reset", seeds[first:first + size]))
+            for _, connection, _, _ in self.workers:
+                connection.recv()
+        else:
+            for env, env_seed in zip(self.envs, seeds):
+                env.reset(env_seed)
+        return self.observations
+        
+    def step(self, actions):
+        # Returns (observations, rewards, dones, infos); finished environments restart
+        # right away, so their observation is already the next episode's first one
+        if self.workers:
+            for _, connection, first, size in self.workers:
+                connection.send(("step", list(actions[first:first + size])))
+            results = []
+            for _, connection, _, _ in self.workers:
+                results.extend(connection.recv())
+        else:
+            results = [step_and_reset(env, action, self.count) for env, action in zip(self.envs, actions)]
+        rewards, dones, infos = zip(*results)
+        return self.observations, list(rewards), list(dones), list(infos)
+        
+    def close(self):
+        for process, connection, _, _ in self.workers:
+            connection.send(("close", None))
+            process.join()
+        self.workers = []
+        for env in self.envs:
+            env.obs.release()
+        self.envs = []
+        
+        # Unlink first so the segment is freed even if unmapping fails below (or was
+        # already unlinked by an earlier close that did)
+        self.array = None
+        try:
+            self.memory.unlink()
+        except FileNotFoundError:
+            pass
+        
+        # Observations handed out by reset and step point into the buffer, so they have
+        # to be dropped before it can be unmapped; close again once they are
+        try:
+            self.buffer.release()
+            self.memory.close()
+        except BufferError:
+            raise BufferError("drop the observations returned by VectorEnv.reset/step (and any "
+                              "views of them) before closing it") from None
 
 # Start the game
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scooby Doo: Forest Rescue")
+    parser.add_argument("--infinite", action="store_true", 
+                        help="explore an open-ended forest streamed in chunks")
+    parser.add_argument("--seed", type=int, 
+                        help="seed for world generation and AI (random if omitted)")
+    parser.add_argument("--record", metavar="FILE", 
+                        help="record this session's input to FILE for later replay")
+    parser.add_argument("--replay", metavar="FILE", 
+                        help="replay a recorded session as fast as possible and check it for divergence")
+    parser.add_argument("--headless", action="store_true", 
+                        help="skip drawing during --replay (set SDL_VIDEODRIVER=dummy to hide the window too)")
+    parser.add_argument("--capture", metavar="FILE", 
+                        help="capture frames to a video FILE via ffmpeg, or to PNGs if FILE has a "
+                             "pattern like frames/%%05d.png (needs NumPy)")
+    parser.add_argument("--capture-scale", type=int, default=1, metavar="N", 
+                        help="keep every Nth pixel of captured frames")
+    parser.add_argument("--capture-gray", action="store_true", help="capture grayscale frames")
+    parser.add_argument("--level", metavar="FILE", 
+                        help="play on the maps of a level file (see --export-level)")
+    parser.add_argument("--export-level", metavar="FILE", 
+                        help="write the forest and neighborhood generated from --seed to a level file")
+    parser.add_argument("--load", metavar="FILE", 
+                        help="resume a game saved with F5 (F9 reloads the quicksave in game)")
+    parser.add_argument("--memory-benchmark", action="store_true", 
+                        help="report the memory used per monster, friend and collectible at 100k of each")
+    parser.add_argument("--batch", type=int, metavar="GAMES", 
+                        help="play GAMES headless bot games per parameter set and report the results")
+    parser.add_argument("--policy", choices=sorted(BOT_POLICIES), default="seek", 
+                        help="bot used by --batch (default: seek)")
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2", 
+                        help="try each value of a balance constant in --batch (repeatable; "
+                             "combinations are crossed): " + ", ".join(BALANCE_PARAMETERS))
+    parser.add_argument("--workers", type=int, help="worker processes for --batch (default: all cores)")
+    parser.add_argument("--max-ticks", type=int, default=FPS * 60 * 5, 
+                        help="end a --batch game as a timeout after this many ticks (default: 5 minutes)")
+    parser.add_argument("--report", metavar="FILE", help="stream --batch results to FILE as JSON lines")
+    args = parser.parse_args()
+    if args.seed is not None and not -2**63 <= args.seed < 2**63:
+        # Recordings store the seed as a signed 64-bit integer
+        parser.error("--seed must fit in a signed 64-bit integer")
+    if args.record and args.load:
+        # Replays always start from a fresh game, so they can't begin at a saved one
+        parser.error("--record can't be combined with --load")
+    
+    if args.batch:
+        report = run_batch(args.batch, args.policy, args.sweep, args.seed or 0, args.max_ticks, 
+                           args.workers, args.report)
+        for line in report.lines():
+            print(line)
+        sys.exit(0)
+    
+    if args.memory_benchmark:
+        for name, size in measure_entity_memory():
+            print(f"{name}: {size:.0f} bytes per entity")
+        sys.exit(0)
+        
+    if args.export_level:
+        world = World(args.seed, False, TILE_SIZE * 40, TILE_SIZE * 30)
+        neighborhood = Neighborhood(TILE_SIZE * 60, TILE_SIZE * 40, world.rng.stream("neighborhood"))
+        export_level(args.export_level, world.forest, world.friend_spawns, world.monster_spawns, neighborhood)
+        print(f"Wrote level for seed {world.rng.seed} to {args.export_level}")
+        sys.exit(0)
+        
+    capture = None
+    if args.capture:
+        capture = FrameCapture(screen, args.capture_scale, args.capture_gray, args.capture)
+        
+    if args.replay:
+        replay = SessionReplay(args.replay)
+        try:
+            ticks, seconds, diverged = replay.run(render=not args.headless, capture=capture)
+        finally:
+            if capture:
+                capture.close()
+        print(f"Replayed {ticks} ticks in {seconds:.2f}s ({ticks / max(seconds, 1e-9):.0f} ticks/s)")
+        if diverged is not None:
+            print(f"Replay diverged from the recording at tick {diverged}")
+            sys.exit(1)
+        sys.exit(0)
+    
+    game = Game(infinite=args.infinite, seed=args.seed, world_pool=WorldPool(), 
+                scene_preloader=ScenePreloader(), save_file=args.load, 
+                level=Level(args.level) if args.level else None)
+    recorder = SessionRecorder(args.record, game.seed, game.infinite, game.level) if args.record else None
+    game.run(recorder, capture)
\ No newline at end of file